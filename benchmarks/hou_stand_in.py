@@ -0,0 +1,561 @@
+"""
+Stand-in for the hou module, so the package can run outside of Houdini.
+Simulates a node tree with float and int parameter tuples, scene files,
+event callbacks, undo groups and a configurable cost of every parameter
+write. Qt helpers are provided if PySide2 is available.
+"""
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from timeit import default_timer
+
+SET_COST = float(os.environ.get('HOU_STAND_IN_SET_COST', 0))  # s per parameter write
+
+stats = {
+    'sets': 0,
+    'undoable_sets': 0,
+    'undo_groups': 0,
+}
+
+
+def setSetCost(seconds):
+    """Sets time spent by every parameter write, simulating the Houdini overhead."""
+    global SET_COST
+    SET_COST = seconds
+
+
+def resetStats():
+    for key in stats:
+        stats[key] = 0
+
+
+def _spend(seconds):
+    if seconds <= 0:
+        return
+    deadline = default_timer() + seconds
+    while default_timer() < deadline:
+        pass
+
+
+class OperationFailed(Exception):
+    pass
+
+
+class ObjectWasDeleted(Exception):
+    pass
+
+
+class _EnumValue(object):
+    def __init__(self, name):
+        self._name = name
+
+    def name(self):
+        return self._name
+
+    def __repr__(self):
+        return self._name
+
+
+class parmTemplateType(object):
+    Int = _EnumValue('parmTemplateType.Int')
+    Float = _EnumValue('parmTemplateType.Float')
+    String = _EnumValue('parmTemplateType.String')
+    Toggle = _EnumValue('parmTemplateType.Toggle')
+
+
+class severityType(object):
+    Message = _EnumValue('severityType.Message')
+    Warning = _EnumValue('severityType.Warning')
+    Error = _EnumValue('severityType.Error')
+
+
+class updateMode(object):
+    AutoUpdate = _EnumValue('updateMode.AutoUpdate')
+    OnMouseUp = _EnumValue('updateMode.OnMouseUp')
+    Manual = _EnumValue('updateMode.Manual')
+
+
+class valueLadderDataType(object):
+    Float = _EnumValue('valueLadderDataType.Float')
+    Int = _EnumValue('valueLadderDataType.Int')
+
+
+class nodeEventType(object):
+    BeingDeleted = _EnumValue('nodeEventType.BeingDeleted')
+    ParmTupleChanged = _EnumValue('nodeEventType.ParmTupleChanged')
+
+
+class hipFileEventType(object):
+    BeforeClear = _EnumValue('hipFileEventType.BeforeClear')
+    AfterClear = _EnumValue('hipFileEventType.AfterClear')
+    BeforeLoad = _EnumValue('hipFileEventType.BeforeLoad')
+    AfterLoad = _EnumValue('hipFileEventType.AfterLoad')
+
+
+class playbarEvent(object):
+    Started = _EnumValue('playbarEvent.Started')
+    Stopped = _EnumValue('playbarEvent.Stopped')
+    FrameChanged = _EnumValue('playbarEvent.FrameChanged')
+
+
+_update_mode = updateMode.AutoUpdate
+
+
+def updateModeSetting():
+    return _update_mode
+
+
+def setUpdateMode(mode):
+    global _update_mode
+    _update_mode = mode
+
+
+def isUIAvailable():
+    return True
+
+
+def expandString(text):
+    pref_dir = os.environ.get('HOUDINI_USER_PREF_DIR') or tempfile.gettempdir()
+    return text.replace('$HOUDINI_USER_PREF_DIR', pref_dir)
+
+
+class undos(object):
+    _disabled = 0
+
+    @staticmethod
+    @contextmanager
+    def group(label):
+        stats['undo_groups'] += 1
+        yield
+
+    @staticmethod
+    @contextmanager
+    def disabler():
+        undos._disabled += 1
+        try:
+            yield
+        finally:
+            undos._disabled -= 1
+
+
+def _countSet(count=1):
+    stats['sets'] += count
+    if not undos._disabled:
+        stats['undoable_sets'] += count
+    _spend(SET_COST * count)
+
+
+class ParmTemplate(object):
+    def __init__(self, template_type):
+        self._type = template_type
+
+    def type(self):
+        return self._type
+
+
+class NodeType(object):
+    def __init__(self, name, category='Object'):
+        self._name = name
+        self._category = category
+
+    def name(self):
+        return self._name
+
+    def nameWithCategory(self):
+        return '{}/{}'.format(self._category, self._name)
+
+    def icon(self):
+        return 'OBJ_' + self._name
+
+
+class Parm(object):
+    def __init__(self, parm_tuple, index, name, value):
+        self._tuple = parm_tuple
+        self._index = index
+        self._name = name
+        self._value = value
+        self._keyframes = []
+
+    def name(self):
+        return self._name
+
+    def description(self):
+        return self._tuple.name().capitalize()
+
+    def path(self):
+        return '{}/{}'.format(self._tuple.node().path(), self._name)
+
+    def node(self):
+        return self._tuple.node()
+
+    def tuple(self):
+        return self._tuple
+
+    def componentIndex(self):
+        return self._index
+
+    def isLocked(self):
+        return False
+
+    def parmTemplate(self):
+        return self._tuple.parmTemplate()
+
+    def eval(self):
+        return self._value
+
+    def set(self, value):
+        _countSet()
+        self._value = value
+
+    def isSpare(self):
+        return self._tuple.isSpare()
+
+    def isMultiParmParent(self):
+        return False
+
+    def isMultiParmInstance(self):
+        return False
+
+    def multiParmInstances(self):
+        return ()
+
+    def keyframes(self):
+        return list(self._keyframes)
+
+    def setKeyframes(self, keyframes):
+        _countSet()
+        self._keyframes = list(keyframes)
+
+    def deleteAllKeyframes(self):
+        self._keyframes = []
+
+
+class ParmTuple(object):
+    componentSuffixes = 'xyzw'
+
+    def __init__(self, node, name, template_type, values, spare=False):
+        self._node = node
+        self._name = name
+        self._spare = spare
+        self._template = ParmTemplate(template_type)
+        suffixes = self.componentSuffixes if len(values) > 1 else ('',)
+        self._parms = [Parm(self, index, name + suffixes[index], value) for index, value in enumerate(values)]
+
+    def __len__(self):
+        return len(self._parms)
+
+    def __iter__(self):
+        return iter(self._parms)
+
+    def __getitem__(self, index):
+        return self._parms[index]
+
+    def name(self):
+        return self._name
+
+    def node(self):
+        return self._node
+
+    def parmTemplate(self):
+        return self._template
+
+    def isSpare(self):
+        return self._spare
+
+    def isMultiParmInstance(self):
+        return False
+
+    def eval(self):
+        return tuple(parm._value for parm in self._parms)
+
+    def set(self, values):
+        _countSet(len(self._parms))
+        for parm, value in zip(self._parms, values):
+            parm._value = value
+
+
+class Node(object):
+    def __init__(self, name, parent=None, node_type=None):
+        self._name = name
+        self._parent = parent
+        self._type = node_type or NodeType('subnet')
+        self._children = []
+        self._child_names = {}
+        self._tuples = []
+        self._parms = {}
+        self._callbacks = []
+        if parent is not None:
+            parent._children.append(self)
+            parent._child_names[name] = self
+
+    def name(self):
+        return self._name
+
+    def path(self):
+        if self._parent is None:
+            return '/'
+        parent_path = self._parent.path()
+        return '{}/{}'.format('' if parent_path == '/' else parent_path, self._name)
+
+    def type(self):
+        return self._type
+
+    def children(self):
+        return tuple(self._children)
+
+    def node(self, path):
+        node = self
+        for name in path.split('/'):
+            if name in ('', '.'):
+                continue
+            node = node._parent if name == '..' else node._child_names.get(name)
+            if node is None:
+                return
+        return node
+
+    def createNode(self, type_name, name=None):
+        name = name or '{}{}'.format(type_name, len(self._children) + 1)
+        return Node(name, self, NodeType(type_name))
+
+    def addParmTuple(self, name, template_type, values, spare=False):
+        parm_tuple = ParmTuple(self, name, template_type, values, spare)
+        self._tuples.append(parm_tuple)
+        for parm in parm_tuple:
+            self._parms[parm.name()] = parm
+        return parm_tuple
+
+    def parmTuples(self):
+        return tuple(self._tuples)
+
+    def parmTuple(self, name):
+        for parm_tuple in self._tuples:
+            if parm_tuple.name() == name:
+                return parm_tuple
+
+    def parm(self, name):
+        return self._parms.get(name)
+
+    def spareParms(self):
+        return tuple(parm for parm_tuple in self._tuples if parm_tuple.isSpare() for parm in parm_tuple)
+
+    def addEventCallback(self, event_types, callback):
+        self._callbacks.append((tuple(event_types), callback))
+
+    def removeEventCallback(self, event_types, callback):
+        try:
+            self._callbacks.remove((tuple(event_types), callback))
+        except ValueError:
+            raise OperationFailed('Callback is not registered')
+
+    def eventCallbacks(self):
+        return tuple(self._callbacks)
+
+
+_root = Node('')
+
+
+def node(path):
+    if not path.startswith('/'):
+        return
+    return _root.node(path)
+
+
+def parm(path):
+    node_path, _, name = path.rpartition('/')
+    found = node(node_path or '/')
+    if found is not None:
+        return found.parm(name)
+
+
+def clearScene():
+    """Removes all the nodes."""
+    global _root
+    _root = Node('')
+
+
+def createScene(node_count, parent_path='/obj'):
+    """
+    Creates nodes with a float t tuple of three components and an int div
+    parameter under the parent. Returns the nodes.
+    """
+    parent = _root
+    for name in parent_path.split('/'):
+        if name:
+            parent = parent.node(name) or Node(name, parent)
+
+    nodes = []
+    for number in range(node_count):
+        child = parent.createNode('geo', 'geo{}'.format(number))
+        child.addParmTuple('t', parmTemplateType.Float, (number * 0.1, 1.0, -number * 0.1))
+        child.addParmTuple('div', parmTemplateType.Int, (number % 7,))
+        nodes.append(child)
+    return nodes
+
+
+_TEMPLATE_TYPES = dict((template_type.name(), template_type) for template_type in
+                       (parmTemplateType.Int, parmTemplateType.Float, parmTemplateType.String, parmTemplateType.Toggle))
+
+
+def _nodeData(node):
+    return {
+        'name': node.name(),
+        'type': node.type().name(),
+        'parm_tuples': [(parm_tuple.name(), parm_tuple.parmTemplate().type().name(), parm_tuple.eval(),
+                         parm_tuple.isSpare()) for parm_tuple in node.parmTuples()],
+        'children': [_nodeData(child) for child in node.children()],
+    }
+
+
+def _createNodes(parent, children):
+    for data in children:
+        child = parent.createNode(data['type'], data['name'])
+        for name, template_type, values, spare in data['parm_tuples']:
+            child.addParmTuple(name, _TEMPLATE_TYPES[template_type], values, spare)
+        _createNodes(child, data['children'])
+
+
+class hipFile(object):
+    """Scene files hold the node tree as JSON. Event callbacks are called on clear and load."""
+    _path = 'untitled.hip'
+    _callbacks = []
+
+    @staticmethod
+    def path():
+        return hipFile._path
+
+    @staticmethod
+    def addEventCallback(callback):
+        hipFile._callbacks.append(callback)
+
+    @staticmethod
+    def removeEventCallback(callback):
+        hipFile._callbacks.remove(callback)
+
+    @staticmethod
+    def eventCallbacks():
+        return tuple(hipFile._callbacks)
+
+    @staticmethod
+    def _notify(event_type):
+        for callback in list(hipFile._callbacks):
+            callback(event_type)
+
+    @staticmethod
+    def clear(suppress_save_prompt=False):
+        hipFile._notify(hipFileEventType.BeforeClear)
+        clearScene()
+        hipFile._path = 'untitled.hip'
+        hipFile._notify(hipFileEventType.AfterClear)
+
+    @staticmethod
+    def load(file_path, suppress_save_prompt=False, ignore_load_warnings=False):
+        try:
+            with open(file_path) as scene_file:
+                children = json.load(scene_file)
+        except (IOError, OSError, ValueError) as e:
+            raise OperationFailed('Could not load {}: {}'.format(file_path, e))
+        hipFile._notify(hipFileEventType.BeforeLoad)
+        clearScene()
+        _createNodes(_root, children)
+        hipFile._path = file_path
+        hipFile._notify(hipFileEventType.AfterLoad)
+
+    @staticmethod
+    def save(file_name=None, save_to_recent_files=True):
+        file_path = file_name or hipFile._path
+        with open(file_path, 'w') as scene_file:
+            json.dump([_nodeData(child) for child in _root.children()], scene_file)
+        hipFile._path = file_path
+
+
+class playbar(object):
+    _callbacks = []
+
+    @staticmethod
+    def addEventCallback(callback):
+        playbar._callbacks.append(callback)
+
+    @staticmethod
+    def removeEventCallback(callback):
+        playbar._callbacks.remove(callback)
+
+    @staticmethod
+    def eventCallbacks():
+        return tuple(playbar._callbacks)
+
+
+class ui(object):
+    _status = ('', severityType.Message)
+
+    @staticmethod
+    def setStatusMessage(message, severity=severityType.Message):
+        ui._status = (message, severity)
+
+    @staticmethod
+    def statusMessage():
+        return ui._status
+
+    @staticmethod
+    def readMultiInput(message, input_labels, buttons=('OK',), default_choice=0, close_choice=-1,
+                       initial_contents=(), title=None):
+        return close_choice, tuple(initial_contents)
+
+    @staticmethod
+    def openValueLadder(value, callback, data_type=None):
+        pass
+
+    @staticmethod
+    def updateValueLadder(x, y, alt, shift):
+        pass
+
+    @staticmethod
+    def closeValueLadder():
+        pass
+
+
+try:
+    from PySide2.QtCore import Signal
+    from PySide2.QtGui import QIcon
+    from PySide2.QtWidgets import QHBoxLayout, QLineEdit, QWidget
+except ImportError:
+    qt = None
+else:
+    class _InputField(QWidget):
+        FloatType = 'float'
+        IntegerType = 'int'
+
+        valueChanged = Signal()
+
+        def __init__(self, data_type, num_components, label=None):
+            super(_InputField, self).__init__()
+            layout = QHBoxLayout(self)
+            layout.setContentsMargins(0, 0, 0, 0)
+            self.lineEdits = [QLineEdit() for _ in range(num_components)]
+            for line_edit in self.lineEdits:
+                line_edit.editingFinished.connect(self.valueChanged)
+                layout.addWidget(line_edit)
+            self._value = 0.0
+
+        def value(self):
+            return self._value
+
+        def setValue(self, value):
+            self._value = value
+            self.lineEdits[0].setText(str(value))
+            self.valueChanged.emit()
+
+    class qt(object):
+        InputField = _InputField
+
+        @staticmethod
+        def Icon(name, width=16, height=16):
+            return QIcon()
+
+        @staticmethod
+        def styleSheet():
+            return ''
+
+        @staticmethod
+        def mainWindow():
+            return None
@@ -0,0 +1,352 @@
+"""
+Benchmarks of the package outside of Houdini. The hou module is replaced
+by hou_stand_in, Qt widgets run on the offscreen platform and are skipped
+if PySide2 is not available.
+
+    python benchmarks/run.py
+    python benchmarks/run.py --sizes 1000 10000 --set-cost 2e-6 --only preview
+    python benchmarks/run.py --save-baseline
+
+Results are compared with the baseline file, a benchmark slower than the
+baseline by more than the tolerance is reported as a regression and makes
+the exit code non-zero.
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+from timeit import default_timer
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARKS_DIR), 'python2.7libs'))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import hou_stand_in  # noqa: E402
+
+sys.modules['hou'] = hou_stand_in
+
+try:
+    from PySide2.QtWidgets import QApplication
+except ImportError:
+    QApplication = None
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+BATCH_FILES = 4
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+TOLERANCE = 0.25
+
+_benchmarks = []
+
+
+def benchmark(name, qt=False):
+    """
+    Registers the benchmark. The function takes the number of parameters
+    and returns (run, items): a callable to time and the number of items
+    it processes.
+    """
+    def register(function):
+        _benchmarks.append((name, qt, function))
+        return function
+    return register
+
+
+def sceneParms(size):
+    """Creates a scene with the number of parameters, four per node."""
+    hou_stand_in.clearScene()
+    nodes = hou_stand_in.createScene((size + 3) // 4)
+    parms = [parm for node in nodes for parm_tuple in node.parmTuples() for parm in parm_tuple]
+    return parms[:size]
+
+
+def _boundEngine(size, expression, variables=None):
+    from edit_parms.engine import Engine
+
+    engine = Engine()
+    engine.bind(sceneParms(size))
+    engine.setExpression(expression)
+    engine.setVariables(variables or {})
+    return engine
+
+
+@benchmark('engine.bind')
+def benchEngineBind(size):
+    from edit_parms.engine import Engine
+
+    parms = sceneParms(size)
+    return lambda: Engine().bind(parms), size
+
+
+@benchmark('engine.evaluate')
+def benchEngineEvaluate(size):
+    engine = _boundEngine(size, 'v * k + sin(v)', {'k': 2})
+    expression = engine.expression()
+    registry = engine.registry()
+    return lambda: expression.bind({'k': 2}).evaluateMany(registry.initialValues(), registry.integers()), size
+
+
+@benchmark('engine.evaluate_elements')
+def benchEngineEvaluateElements(size):
+    engine = _boundEngine(size, 'v + i / n * k + rand(seed)', {'k': 2, 'seed': 1})
+    counter = [0]
+
+    def run():
+        counter[0] += 1
+        engine.setVariables({'k': 2, 'seed': counter[0]})
+        engine.evaluate()
+    return run, size
+
+
+def _checkScalarFailures(values):
+    """Raises RuntimeError if the invalid results of the single value are written instead of failing."""
+    from edit_parms.expression import compileExpression
+
+    for text in ('1 / (v - v)', '(v - v - 1) ** 0.5', 'v - v + 1e308 * 10'):
+        evaluator = compileExpression(text).bind({})
+        if evaluator.evaluateMany(values) != [None] or evaluator.error is None:
+            raise RuntimeError('{}: invalid result is not reported as a failure'.format(text))
+
+
+@benchmark('engine.evaluate_scalar')
+def benchEngineEvaluateScalar(size):
+    engine = _boundEngine(size, 'v * k + sin(v)', {'k': 2})
+    values = list(engine.registry().initialValues())
+    _checkScalarFailures(engine.registry().initialValues()[:1])
+    counter = [0]
+
+    def run():
+        counter[0] += 1
+        engine.setVariables({'k': 2 + counter[0] % 2})
+        evaluator = engine.evaluator()
+        for value in values:
+            evaluator(value)
+    return run, size
+
+
+@benchmark('engine.preview')
+def benchEnginePreview(size):
+    engine = _boundEngine(size, 'v * k')
+    counter = [0]
+
+    def run():
+        counter[0] += 1
+        engine.setVariables({'k': 1 + counter[0] % 2})
+        engine.preview()
+    return run, size
+
+
+@benchmark('engine.apply')
+def benchEngineApply(size):
+    engine = _boundEngine(size, 'v * k')
+    counter = [0]
+
+    def run():
+        counter[0] += 1
+        engine.setVariables({'k': 1 + counter[0] % 2})
+        engine.apply()
+    return run, size
+
+
+@benchmark('storage.history')
+def benchStorageHistory(size):
+    from edit_parms.storage import Storage
+
+    storage = Storage()
+    names = ['parm{}'.format(number) for number in range(min(size, 10000))]
+
+    def run():
+        with storage.batch():
+            for name in names:
+                storage.addToHistory(name, {'expression': 'v * k', 'variables': {'k': 2}})
+        for name in names:
+            storage.setupFromHistory(name)
+    return run, len(names)
+
+
+@benchmark('batch.files')
+def benchBatchFiles(size):
+    from edit_parms import batch
+
+    directory = tempfile.mkdtemp(prefix='batch_', dir=os.environ.get('HOUDINI_USER_PREF_DIR'))
+    jobs = []
+    for number in range(BATCH_FILES):
+        sceneParms(size // BATCH_FILES)
+        scene_path = os.path.join(directory, 'scene{}.hip'.format(number))
+        hou_stand_in.hipFile.save(scene_path)
+        output_path = batch.outputPath(scene_path, os.path.join(directory, 'out'))
+        jobs.append({
+            'file': scene_path,
+            'output': output_path,
+            'report': batch.reportPath(output_path),
+            'nodes': '/obj/*',
+            'parms': 't?|div',
+            'node_type': None,
+            'expression': 'v * k',
+            'variables': {'k': 2},
+            'keyframes': False,
+            'slopes': False,
+            'frames': False,
+            'dry_run': False,
+        })
+    os.makedirs(os.path.join(directory, 'out'))
+
+    def run():
+        for report in batch.runJobs(jobs, 2, 'hou_stand_in'):
+            if report['error'] or not report['changed']:
+                raise RuntimeError('{}: {}'.format(report['file'], report['error'] or 'nothing changed'))
+    return run, size
+
+
+@benchmark('ParmsWidget.addParms', qt=True)
+def benchParmsWidgetAddParms(size):
+    from edit_parms.parms_widget import ParmsWidget
+
+    widget = ParmsWidget()
+    parms = sceneParms(size)
+
+    def run():
+        widget.clear()
+        widget.addParms(parms)
+    return run, size
+
+
+@benchmark('ParmListModel.data', qt=True)
+def benchParmListModelData(size):
+    from PySide2.QtCore import Qt
+    from edit_parms.parms_widget import ParmsWidget
+
+    widget = ParmsWidget()
+    widget.addParms(sceneParms(size))
+    model = widget._model
+    indices = [model.index(row, 0) for row in range(model.rowCount())]
+
+    def run():
+        for index in indices:
+            model.data(index, Qt.DisplayRole)
+            model.data(index, Qt.DecorationRole)
+            model.data(index, Qt.ToolTipRole)
+    return run, size
+
+
+@benchmark('MainWindow.preview', qt=True)
+def benchMainWindowPreview(size):
+    from edit_parms.main_window import MainWindow
+
+    window = MainWindow(sceneParms(size))
+    window._expr.createParms({'k': 2})
+    counter = [0]
+
+    def run():
+        counter[0] += 1
+        window._expr._expr_field.setCurrentText('v * {}'.format(1 + counter[0] % 2))
+        window.preview()
+        window._preview_task.finish()
+    return run, size
+
+
+def measure(run, repeat):
+    """Returns the best and the median time of the runs in seconds, after a warm-up run."""
+    run()
+    times = []
+    for _ in range(repeat):
+        start_time = default_timer()
+        run()
+        times.append(default_timer() - start_time)
+    times.sort()
+    return times[0], times[len(times) // 2]
+
+
+def runBenchmarks(sizes, repeat=5, only=None):
+    """Yields (name@size, result) pairs of the benchmarks."""
+    for name, qt, function in _benchmarks:
+        if only and not any(pattern in name for pattern in only):
+            continue
+
+        if qt and QApplication is None:
+            print('{:<28} skipped, PySide2 is not available'.format(name))
+            continue
+
+        for size in sizes:
+            run, items = function(size)
+            hou_stand_in.resetStats()
+            best, median = measure(run, repeat)
+            yield '{}@{}'.format(name, size), {
+                'latency_ms': median * 1000,
+                'best_ms': best * 1000,
+                'throughput': items / median if median else None,
+                'sets_per_run': hou_stand_in.stats['sets'] // (repeat + 1),
+            }
+
+
+def compare(result, baseline, tolerance):
+    """Returns relative change of the latency against the baseline and the regression flag."""
+    if not baseline or not baseline.get('latency_ms'):
+        return None, False
+    change = result['latency_ms'] / baseline['latency_ms'] - 1
+    return change, change > tolerance
+
+
+def parseArgs(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the package outside of Houdini.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='numbers of parameters')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per benchmark')
+    parser.add_argument('--set-cost', type=float, default=hou_stand_in.SET_COST,
+                        help='seconds spent by every simulated parameter write')
+    parser.add_argument('--only', nargs='+', help='run benchmarks with names containing any of the strings')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline file')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='allowed relative slowdown against the baseline')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parseArgs(argv)
+    hou_stand_in.setSetCost(args.set_cost)
+
+    pref_dir = tempfile.mkdtemp(prefix='editparms_bench_')
+    os.environ['HOUDINI_USER_PREF_DIR'] = pref_dir
+    if QApplication is not None and QApplication.instance() is None:
+        app = QApplication([])  # noqa: F841, keeps the application alive
+
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    print('{:<28} {:>12} {:>14} {:>10}'.format('benchmark', 'latency, ms', 'items/s', 'baseline'))
+    results = {}
+    regressions = []
+    try:
+        for key, result in runBenchmarks(args.sizes, args.repeat, args.only):
+            results[key] = result
+            change, regressed = compare(result, baseline.get(key), args.tolerance)
+            if regressed:
+                regressions.append(key)
+            print('{:<28} {:>12.3f} {:>14.0f} {:>10}{}'.format(
+                key, result['latency_ms'], result['throughput'] or 0,
+                '' if change is None else '{:+.0%}'.format(change),
+                '  REGRESSION' if regressed else ''))
+    finally:
+        shutil.rmtree(pref_dir, ignore_errors=True)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+        print('Baseline saved to {}'.format(args.baseline))
+        return 0
+
+    if regressions:
+        print('{} regression(s): {}'.format(len(regressions), ', '.join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1 +1,47 @@
-from .main_window import MainWindow
+_editor = None
+
+
+def _mainWindowClass():
+    from .main_window import MainWindow
+    return MainWindow
+
+
+def MainWindow(parms=None, parent=None):
+    """Creates the editor dialog, importing the Qt modules on first call."""
+    return _mainWindowClass()(parms, parent)
+
+
+def prewarm():
+    """
+    Builds the dialog once the event loop is idle, so the first opening
+    is instant. Can be called from a startup script.
+    """
+    from PySide2.QtCore import QTimer
+    QTimer.singleShot(0, _sharedEditor)
+
+
+def _sharedEditor():
+    global _editor
+    if _editor is None:
+        import hou
+        _editor = MainWindow(parent=hou.qt.mainWindow())
+    return _editor
+
+
+def showEditor(parms, parent=None):
+    """
+    Shows the dialog for the parameters, parented to the Houdini main
+    window by default. The dialog is built once per session and reset on
+    every call. If the shared dialog is still open, a separate one is shown.
+    """
+    if parent is None:
+        import hou
+        parent = hou.qt.mainWindow()
+
+    editor = _sharedEditor()
+    if editor.isVisible() or parent is not editor.parent():
+        editor = MainWindow(parms, parent)
+    else:
+        editor.setParms(parms)
+    editor.show()
+    return editor
@@ -0,0 +1,336 @@
+"""
+Applies an expression to the parameters of many scene files.
+
+    hython -m edit_parms.batch shot_*.hip --nodes "/obj/**" --parms "t?" --expression "v * k" --var k=2
+
+Each file is loaded, edited, saved and described by a JSON report written
+next to the saved file or into the report directory. Files are processed
+by long-lived worker interpreter processes, started from sys.executable
+(hython) instead of forking the process that has already imported hou,
+so hou is imported once per worker rather than once per file.
+The hou module is imported by name, so the runner can be used with a
+stand-in module outside of Houdini.
+"""
+from __future__ import print_function
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+from multiprocessing.pool import ThreadPool
+from timeit import default_timer
+
+try:
+    from queue import Queue
+except ImportError:  # Python 2
+    from Queue import Queue
+
+REPORT_SUFFIX = '.editparms.json'
+WORKER_OPTION = '--worker'
+
+
+def installHou(module_name='hou'):
+    """Imports the module and registers it as hou for the package modules."""
+    module = importlib.import_module(module_name)
+    sys.modules['hou'] = module
+    return module
+
+
+def _variable(text):
+    name, separator, value = text.partition('=')
+    if not separator or not name:
+        raise argparse.ArgumentTypeError('expected name=value, got {}'.format(text))
+    try:
+        return name, float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError('bad value for {}: {}'.format(name, value))
+
+
+def resolveExpression(expression=None, preset=None, history=None):
+    """
+    Returns (expression, variables) given directly, by preset text or index,
+    or by the parameter name saved in the history.
+    """
+    if expression:
+        return expression, {}
+
+    from .storage import openStorage
+    storage = openStorage()
+
+    if preset is not None:
+        presets = storage.presets
+        if preset in presets:
+            return preset, {}
+        try:
+            return presets[int(preset)], {}
+        except (ValueError, IndexError):
+            raise ValueError('no preset {}'.format(preset))
+
+    data = storage.setupFromHistory(history) or {}
+    if not data.get('expression'):
+        raise ValueError('no history for {}'.format(history))
+    return data['expression'], data.get('variables', {})
+
+
+def outputPath(scene_path, output_dir=None):
+    if not output_dir:
+        return scene_path
+    return os.path.join(output_dir, os.path.basename(scene_path))
+
+
+def reportPath(output_path, report_dir=None):
+    if not report_dir:
+        return output_path + REPORT_SUFFIX
+    return os.path.join(report_dir, os.path.basename(output_path) + REPORT_SUFFIX)
+
+
+def _newReport(job, error=None):
+    return {
+        'file': job['file'],
+        'output': job['output'],
+        'expression': job['expression'],
+        'variables': job['variables'],
+        'bound': 0,
+        'changed': 0,
+        'error': error,
+        'expression_error': None,
+        'seconds': 0.0,
+    }
+
+
+def processFile(job):
+    """
+    Loads the scene, applies the expression and saves the scene. Returns
+    the report, failures are reported instead of being raised.
+    """
+    from .engine import Engine
+    import hou
+
+    report = _newReport(job)
+    start_time = default_timer()
+    try:
+        hou.hipFile.load(job['file'], suppress_save_prompt=True, ignore_load_warnings=True)
+        engine = Engine()
+        report['bound'] = engine.bindByPattern(job['nodes'], job['parms'], job['node_type'])
+        engine.setExpression(job['expression'])
+        engine.setVariables(job['variables'])
+        engine.setKeyframeMode(job['keyframes'], job['slopes'], job['frames'])
+        report['changed'] = engine.apply()
+        report['expression_error'] = engine.errorSummary()
+        if report['changed'] and not job['dry_run']:
+            hou.hipFile.save(job['output'])
+    except Exception as e:
+        report['error'] = '{}: {}'.format(type(e).__name__, e)
+    report['seconds'] = default_timer() - start_time
+
+    try:
+        with open(job['report'], 'w') as report_file:
+            json.dump(report, report_file, indent=2, sort_keys=True)
+    except (IOError, OSError) as e:
+        report['error'] = report['error'] or 'report not written: {}'.format(e)
+    return report
+
+
+class Worker(object):
+    """
+    Long-lived interpreter process that processes the jobs sent to it one
+    by one, see _workerMain. Jobs are written to its stdin one JSON line
+    each, and it answers every job with one JSON line of the report. The
+    process is started on the first job and restarted after a crash.
+    """
+
+    def __init__(self, hou_module='hou'):
+        self._hou_module = hou_module
+        self._process = None
+
+    def _start(self):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(path for path in sys.path if path)
+        self._process = subprocess.Popen([sys.executable, '-m', 'edit_parms.batch', WORKER_OPTION, self._hou_module],
+                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         env=env, universal_newlines=True)
+
+    def process(self, job):
+        """Returns report of the job. A crashed worker is reported as the job error."""
+        if self._process is None:
+            self._start()
+        process = self._process
+        try:
+            process.stdin.write(json.dumps(job) + '\n')
+            process.stdin.flush()
+            line = process.stdout.readline()
+        except (IOError, OSError):  # The worker is gone
+            line = ''
+        try:
+            return json.loads(line)
+        except ValueError:
+            self.close()
+            return _newReport(job, 'worker exited with code {}'.format(process.returncode))
+
+    def close(self):
+        """Lets the process finish on the end of its input and waits for it."""
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except (IOError, OSError):
+            pass
+        process.wait()
+        process.stdout.close()
+
+    def kill(self):
+        """Stops the process at once."""
+        process, self._process = self._process, None
+        if process is not None and process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def _workerMain(hou_module):
+    """
+    Entry point of the worker process, see Worker. Anything else printed to
+    stdout, like Houdini messages, is redirected to stderr so it does not
+    mix with the reports.
+    """
+    reports = os.fdopen(os.dup(sys.stdout.fileno()), 'w')
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    installHou(hou_module)
+    for line in iter(sys.stdin.readline, ''):
+        if not line.strip():
+            continue
+        report = processFile(json.loads(line))
+        reports.write(json.dumps(report) + '\n')
+        reports.flush()
+    return 0
+
+
+def runJobs(jobs, processes=None, hou_module='hou'):
+    """
+    Yields reports of the jobs as they finish. Up to the number of processes
+    jobs run at once, each worker process takes the next job once it is
+    done with the previous one. A single process runs the jobs in place.
+    """
+    if processes == 1 or len(jobs) <= 1:
+        installHou(hou_module)
+        for job in jobs:
+            yield processFile(job)
+        return
+
+    workers = [Worker(hou_module) for _ in range(min(processes or multiprocessing.cpu_count(), len(jobs)))]
+    idle_workers = Queue()
+    for worker in workers:
+        idle_workers.put(worker)
+
+    def runJob(job):
+        worker = idle_workers.get()
+        try:
+            return worker.process(job)
+        finally:
+            idle_workers.put(worker)
+
+    pool = ThreadPool(len(workers))
+    try:
+        for report in pool.imap_unordered(runJob, jobs):
+            yield report
+        pool.close()
+    except BaseException:
+        for worker in workers:
+            worker.kill()
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        for worker in workers:
+            worker.close()
+
+
+def parseArgs(argv=None):
+    parser = argparse.ArgumentParser(prog='edit_parms.batch',
+                                     description='Apply an expression to parameters of scene files.')
+    parser.add_argument('files', nargs='+', help='scene files')
+    parser.add_argument('--nodes', required=True, help='node path glob, like /obj/geo*/xform*, ** matches any depth')
+    parser.add_argument('--parms', required=True, help='parameter name globs separated by |, like t?|r?')
+    parser.add_argument('--node-type', help='node type name glob')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--expression', help='expression, v is the parameter value')
+    source.add_argument('--preset', help='saved preset, by expression text or index')
+    source.add_argument('--history', metavar='PARM_NAME', help='expression and variables saved for the parameter')
+    parser.add_argument('--var', action='append', type=_variable, default=[], metavar='NAME=VALUE',
+                        help='variable value, can be repeated, missing variables are 1')
+    parser.add_argument('--keyframes', action='store_true', help='edit keyframes of animated parameters')
+    parser.add_argument('--slopes', action='store_true', help='edit keyframe slopes too')
+    parser.add_argument('--frames', action='store_true', help='edit keyframe frames too')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--output-dir', help='directory for the edited files, files are saved in place by default')
+    parser.add_argument('--report-dir', help='directory for the reports, next to the saved files by default')
+    parser.add_argument('--dry-run', action='store_true', help='write reports without saving the files')
+    parser.add_argument('--hou-module', default='hou', help='module to import as hou')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 2 and argv[0] == WORKER_OPTION:
+        return _workerMain(argv[1])
+
+    args = parseArgs(argv)
+    installHou(args.hou_module)
+
+    from .expression import compileExpression
+
+    try:
+        expression, variables = resolveExpression(args.expression, args.preset, args.history)
+    except ValueError as e:
+        print('error: {}'.format(e), file=sys.stderr)
+        return 2
+
+    compiled = compileExpression(expression)
+    if not compiled.isValid():
+        print('error: {}'.format(compiled.error), file=sys.stderr)
+        return 2
+
+    variables = dict(variables)
+    for name in compiled.variables:
+        variables.setdefault(name, 1)
+    variables.update(args.var)
+
+    for directory in (args.output_dir, args.report_dir):
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    jobs = []
+    for scene_path in args.files:
+        output_path = outputPath(scene_path, args.output_dir)
+        jobs.append({
+            'file': scene_path,
+            'output': output_path,
+            'report': reportPath(output_path, args.report_dir),
+            'nodes': args.nodes,
+            'parms': args.parms,
+            'node_type': args.node_type,
+            'expression': expression,
+            'variables': variables,
+            'keyframes': args.keyframes,
+            'slopes': args.slopes,
+            'frames': args.frames,
+            'dry_run': args.dry_run,
+        })
+
+    failed = 0
+    for report in runJobs(jobs, args.jobs, args.hou_module):
+        if report['error']:
+            failed += 1
+            print('{}: {}'.format(report['file'], report['error']), file=sys.stderr)
+        else:
+            print('{}: {} of {} parameters changed in {:.2f} s'.format(
+                report['file'], report['changed'], report['bound'], report['seconds']))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
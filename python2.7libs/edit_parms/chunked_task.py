@@ -0,0 +1,109 @@
+from timeit import default_timer
+
+from PySide2.QtCore import QObject, QTimer, Signal
+
+SLICE_TIME = 20  # ms
+
+
+class ChunkedTask(QObject):
+    """
+    Runs steps of a generator in time slices driven by the event loop.
+    The generator yields the number of processed items. The first slice
+    runs immediately, so small tasks complete synchronously.
+    """
+    progressChanged = Signal(int, int)
+    finished = Signal(bool)
+
+    def __init__(self, slice_time=SLICE_TIME, parent=None):
+        super(ChunkedTask, self).__init__(parent)
+        self._slice_time = slice_time / 1000.
+        self._steps = None
+        self._context = None
+        self._total = 0
+        self._done = 0
+        self._start_time = 0
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self._step)
+
+    def isRunning(self):
+        return self._steps is not None
+
+    def total(self):
+        return self._total
+
+    def done(self):
+        return self._done
+
+    def estimatedTimeLeft(self):
+        """Returns estimated time left in seconds or None if unknown yet."""
+        if not self._done:
+            return
+        elapsed = default_timer() - self._start_time
+        return elapsed / self._done * (self._total - self._done)
+
+    def start(self, steps, total, context=None):
+        """
+        Cancels the running task and starts a new one. If given, context
+        is a context manager factory entered around every slice.
+        """
+        self.cancel()
+        self._steps = iter(steps)
+        self._context = context
+        self._total = total
+        self._done = 0
+        self._start_time = default_timer()
+        self._step()
+        if self._steps is not None:
+            self._timer.start()
+
+    def cancel(self):
+        """Stops the running task leaving the remaining steps undone."""
+        if self._steps is None:
+            return
+        self._stop()
+        self.finished.emit(False)
+
+    def finish(self):
+        """Runs the remaining steps synchronously."""
+        if self._steps is None:
+            return
+        self._run(None)
+
+    def _stop(self):
+        self._timer.stop()
+        self._steps = None
+        self._context = None
+
+    def _step(self):
+        self._run(default_timer() + self._slice_time)
+
+    def _run(self, deadline):
+        steps = self._steps
+        context = self._context
+        try:
+            if context is None:
+                completed = self._runSteps(steps, deadline)
+            else:
+                with context():
+                    completed = self._runSteps(steps, deadline)
+        except Exception:
+            self._stop()
+            self.finished.emit(False)
+            raise
+
+        if completed:
+            self._stop()
+            self._done = self._total
+        self.progressChanged.emit(self._done, self._total)
+        if completed:
+            self.finished.emit(True)
+
+    def _runSteps(self, steps, deadline):
+        """Runs steps until the deadline. Returns True if all steps are done."""
+        for done in steps:
+            self._done = done
+            if deadline is not None and default_timer() >= deadline:
+                return False
+        return True
@@ -0,0 +1,60 @@
+import hou
+from PySide2.QtCore import QObject, QTimer
+
+IDLE_TIMEOUT = 750  # ms
+
+
+class CookDeferral(QObject):
+    """
+    Switches the scene to the manual update mode while an interaction is in
+    progress, so previews do not cook the downstream nodes. The previous
+    update mode is restored when the interaction finishes or after the idle
+    timeout, which results in a single consolidated update.
+    """
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT, parent=None):
+        super(CookDeferral, self).__init__(parent)
+        self._enabled = False
+        self._previous_mode = None
+
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.setInterval(idle_timeout)
+        self._idle_timer.timeout.connect(self.end)
+
+    def isEnabled(self):
+        return self._enabled
+
+    def setEnabled(self, enabled):
+        self._enabled = bool(enabled)
+        if not self._enabled:
+            self.end()
+
+    def isActive(self):
+        return self._previous_mode is not None
+
+    def begin(self):
+        """Starts deferral or prolongs the active one."""
+        if not self._enabled:
+            return
+
+        if self._previous_mode is None:
+            self._previous_mode = hou.updateModeSetting()
+            if self._previous_mode != hou.updateMode.Manual:
+                hou.setUpdateMode(hou.updateMode.Manual)
+        self._idle_timer.start()
+
+    def prolong(self):
+        """Restarts the idle timeout of the active deferral."""
+        if self._previous_mode is not None:
+            self._idle_timer.start()
+
+    def end(self):
+        """Restores the previous update mode."""
+        self._idle_timer.stop()
+        if self._previous_mode is None:
+            return
+
+        previous_mode, self._previous_mode = self._previous_mode, None
+        if previous_mode != hou.updateModeSetting():
+            hou.setUpdateMode(previous_mode)
@@ -0,0 +1,322 @@
+import hou
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import profiling
+from .expression import compileExpression, elementValues
+from .harvest import ParmNameIndex, iterIndexEntries, iterNodeEntries, matchNodes, parmEntry
+from .keyframes import KeyframeEditor
+from .parm_registry import ParmRegistry
+from .parm_writer import writeGroup
+
+APPLY_UNDO_LABEL = 'Apply expression to parms'
+
+
+def _concatenate(first, second):
+    if numpy is not None and isinstance(first, numpy.ndarray):
+        return numpy.concatenate((first, numpy.asarray(second, first.dtype)))
+    return list(first) + list(second)
+
+
+class Engine(object):
+    """
+    Bulk expression edit of the bound parameters without any UI. Works in
+    hython and shelf scripts, the dialog is a client of the same engine.
+    Previews are written without undo actions, apply adds a single one.
+    In the keyframe mode the expression edits keyframes of the animated
+    parameters instead of their current values. With a driver parameter
+    set, v holds the driver value for every parameter.
+    """
+
+    def __init__(self, registry=None):
+        self._registry = registry if registry is not None else ParmRegistry()
+        self._expression = None
+        self._variables = {}
+        self._evaluator = None
+        self._keyframes = KeyframeEditor()
+        self._keyframe_mode = False
+        self._key_values = {}
+        self._driver = None
+
+    def reset(self):
+        """Forgets the expression and the captured keyframes, keeping the parameters bound."""
+        self._expression = None
+        self._variables = {}
+        self._evaluator = None
+        self._keyframes.clear()
+        self._key_values = {}
+
+    def registry(self):
+        """Returns registry of the bound parameters."""
+        return self._registry
+
+    def bind(self, parms):
+        """Binds editable parameters, skipping bound ones. Returns number of the bound parameters."""
+        return self.bindEntries(parmEntry(parm) for parm in parms if parm not in self._registry)
+
+    def bindEntries(self, entries):
+        """Binds (parm, initial value, integer flag) entries collected by the harvest functions."""
+        return self._registry.extend(entry for entry in entries if entry)
+
+    def bindNodes(self, node_paths, parm_name=None):
+        """Binds editable parameters of the nodes, only ones named parm_name if it is given."""
+        return sum(self.bindEntries(entries) for _, entries in iterNodeEntries(node_paths, parm_name))
+
+    def bindByPattern(self, node_pattern, parm_pattern, node_type_pattern=None):
+        """Binds parameters matching the name pattern on the nodes matching the path glob."""
+        nodes = matchNodes(node_pattern, node_type_pattern)
+        return sum(self.bindEntries(entries)
+                   for _, entries in iterIndexEntries(nodes, ParmNameIndex(parm_pattern)))
+
+    def restore(self, rows):
+        """Restores initial values and keyframes of the parameters at the rows without adding undo actions."""
+        rows = set(rows)
+        registry = self._registry
+        values = [value if row in rows else None
+                  for row, value in enumerate(registry.initialValues())]
+        with hou.undos.disabler():
+            for group in registry.groups():
+                if not rows.isdisjoint(group.rows):
+                    writeGroup(registry, group, values)
+            for row in rows:
+                self._keyframes.write(registry.parm(row))
+
+    def unbind(self, rows=None):
+        """
+        Restores initial values of the parameters at the rows and unbinds
+        them. All the parameters are unbound if rows are not given.
+        """
+        if rows is None:
+            self.rollback()
+            self._registry.clear()
+            self._keyframes.clear()
+            return
+
+        self.release(rows)
+        self._registry.removeRows(rows)
+
+    def release(self, rows):
+        """
+        Restores the parameters at the rows and drops their captured keyframes.
+        Used before removing the rows from the registry.
+        """
+        rows = set(rows)
+        self.restore(rows)
+        for row in rows:
+            self._keyframes.forget(self._registry.parm(row))
+
+    def discard(self, rows):
+        """Unbinds the parameters at the rows without writing them, e.g. when their nodes are deleted."""
+        rows = set(rows)
+        for row in rows:
+            self._keyframes.forget(self._registry.parm(row))
+        self._registry.removeRows(rows)
+
+    def setDriver(self, parm):
+        """
+        Makes v hold the current value of the driver parameter instead of
+        the initial value of every parameter. The driver itself is never
+        written. None restores the default.
+        """
+        self._driver = parm
+
+    def driver(self):
+        return self._driver
+
+    def _sourceValues(self):
+        """Returns values of v indexed by registry row."""
+        registry = self._registry
+        if self._driver is None:
+            return registry.initialValues()
+
+        value = self._driver.eval()
+        if numpy is not None:
+            return numpy.full(len(registry), value, numpy.float64)
+        return [value] * len(registry)
+
+    def setKeyframeMode(self, enabled, slopes=False, times=False):
+        """
+        Makes the expression edit keyframe values of the animated parameters,
+        optionally slopes and frames too, with v holding the edited number.
+        Changes take effect on the next preview or apply.
+        """
+        self._keyframe_mode = enabled
+        self._keyframes.setOptions(slopes, times)
+
+    def isKeyframeMode(self):
+        return self._keyframe_mode
+
+    def setExpression(self, text):
+        """Sets expression text. The evaluator is rebuilt only if the text changes."""
+        if self._expression is not None and self._expression.text == text:
+            return
+        self._expression = compileExpression(text)
+        self._evaluator = None
+
+    def expression(self):
+        """Returns compiled expression or None if it is not set."""
+        return self._expression
+
+    def setVariables(self, variables):
+        """Sets values of the expression variables by name."""
+        variables = dict(variables)
+        if variables != self._variables:
+            self._variables = variables
+            self._evaluator = None
+
+    def variables(self):
+        return dict(self._variables)
+
+    def evaluator(self):
+        """
+        Returns the expression bound to the variable values or None if there
+        is no valid expression. It is reused until the expression or the
+        variables change, so its memoized results are kept.
+        """
+        if self._expression is None or not self._expression.isValid():
+            return
+
+        if self._evaluator is None:
+            self._evaluator = self._expression.bind(self._variables)
+        return self._evaluator
+
+    @profiling.timed('Engine.evaluate')
+    def evaluate(self):
+        """
+        Returns new values indexed by registry row, None for the failed ones
+        and the driver, or None if there is no valid expression. Keyframes of the animated
+        parameters are evaluated in the same batch in the keyframe mode,
+        their rows keep the initial values.
+        """
+        evaluator = self.evaluator()
+        if evaluator is None:
+            return
+
+        registry = self._registry
+        uses_elements = evaluator.expression.usesElements()
+        node_indices = registry.nodeIndices() if uses_elements else None
+        source_values = self._sourceValues()
+        driver_row = registry.row(self._driver) if self._driver is not None else None
+        if not self._keyframe_mode:
+            self._key_values = {}
+            elements = elementValues(len(registry), node_indices=node_indices) if uses_elements else None
+            new_values = evaluator.evaluateMany(source_values, registry.integers(), elements)
+            if driver_row is not None:
+                new_values[driver_row] = None
+            return new_values
+
+        rows = self._keyframes.animatedRows(registry)
+        key_values, key_integers, key_rows = self._keyframes.fieldValues(registry, rows)
+        elements = None
+        if uses_elements:
+            elements = elementValues(len(registry),
+                                     _concatenate(range(len(registry)), key_rows),
+                                     _concatenate(node_indices, [node_indices[row] for row in key_rows]))
+        results = evaluator.evaluateMany(_concatenate(source_values, key_values),
+                                         _concatenate(registry.integers(), key_integers), elements)
+        initial_values = registry.initialValues()
+        new_values = results[:len(registry)]
+        for row in rows:
+            new_values[row] = initial_values[row]
+        if driver_row is not None:
+            new_values[driver_row] = None
+        self._key_values = self._keyframes.splitResults(registry, rows, results[len(registry):])
+        return new_values
+
+    def _writeGroup(self, group, values, key_values):
+        """Writes values to the group and new fields to keyframes of its animated parameters."""
+        changed = writeGroup(self._registry, group, values)
+        if key_values or self._keyframes.hasChanges():
+            for row in group.rows:
+                parm = self._registry.parm(row)
+                changed += self._keyframes.write(parm, key_values.get(parm))
+        return changed
+
+    def _iterWrite(self, values, key_values):
+        done = 0
+        for group in self._registry.groups():
+            self._writeGroup(group, values, key_values)
+            done += len(group.rows)
+            yield done
+
+    def errorSummary(self):
+        """Returns error of the expression or of the last evaluation pass or None."""
+        if self._expression is not None and not self._expression.isValid():
+            return self._expression.error
+
+        evaluator = self.evaluator()
+        if evaluator is not None:
+            return evaluator.errorSummary()
+
+    def iterPreview(self):
+        """
+        Writes new values group by group, yielding the number of the processed
+        parameters. Undo should be disabled by the caller, the writes can be
+        spread over several slices.
+        """
+        new_values = self.evaluate()
+        if new_values is None:
+            return iter(())
+        return self._iterWrite(new_values, self._key_values)
+
+    def preview(self):
+        """
+        Sets new values to the parameters without adding actions to the undo
+        stack. Parameters already holding the new value are skipped.
+        """
+        with hou.undos.disabler():
+            for _ in self.iterPreview():
+                pass
+
+    @profiling.timed('Engine.rollback')
+    def rollback(self):
+        """
+        Sets the initial values and keyframes to the changed parameters
+        without adding actions to the undo stack.
+        """
+        initial_values = self._registry.initialValues()
+        with hou.undos.disabler():
+            return sum(self._writeGroup(group, initial_values, {}) for group in self._registry.groups())
+
+    @profiling.timed('Engine.apply')
+    def apply(self, label=APPLY_UNDO_LABEL):
+        """
+        Sets new values to the parameters grouped into the single action
+        on the undo stack. Previewed parameters are silently reset to the
+        initial value right before the change, so the undo restores it.
+        Failed values keep the initial value. Returns number of the changed
+        parameters, counting every parameter with edited keyframes once.
+        """
+        new_values = self.evaluate()
+        if new_values is None:
+            self.rollback()
+            return 0
+
+        registry = self._registry
+        initial_values = registry.initialValues()
+        new_values = [initial if value is None else value
+                      for initial, value in zip(initial_values, new_values)]
+        key_values = self._key_values
+        changed = 0
+        with hou.undos.group(label):
+            for group in registry.groups():
+                with hou.undos.disabler():
+                    self._writeGroup(group, initial_values, {})
+                changed += self._writeGroup(group, new_values, key_values)
+        return changed
+
+
+def editParms(parms, expression, variables=None, label=APPLY_UNDO_LABEL):
+    """
+    Applies the expression to the parameters as a single undo action.
+    Returns the engine, so the changes can be inspected or rolled back.
+    """
+    engine = Engine()
+    engine.bind(parms)
+    engine.setExpression(expression)
+    engine.setVariables(variables or {})
+    engine.apply(label)
+    return engine
@@ -10,6 +10,8 @@ from .float_slider import FloatSlider
 class ExprParmWidget(QWidget):
     removed = Signal(str)
     valueChanged = Signal()
+    interactionStarted = Signal()
+    interactionFinished = Signal()
 
     def __init__(self, name, value):
         super(ExprParmWidget, self).__init__()
@@ -45,6 +47,8 @@ class ExprParmWidget(QWidget):
         self._slider.setFocusPolicy(Qt.ClickFocus)
         self._slider.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Ignored)
         self._slider.setSingleStep(0.25)
+        self._slider.interactionStarted.connect(self.interactionStarted)
+        self._slider.interactionFinished.connect(self.interactionFinished)
         layout.addWidget(self._slider)
 
         self._value_field.valueChanged.connect(self._setSliderValue)
@@ -82,4 +86,5 @@ class ExprParmWidget(QWidget):
     def wheelEvent(self, event):
         sign = 1 if event.angleDelta().y() > 0 else -1
         step = 1 if event.modifiers() & Qt.ControlModifier else 0.25
+        self.interactionStarted.emit()  # Finished by the idle timeout
         self._value_field.setValue(self.value + sign * step)
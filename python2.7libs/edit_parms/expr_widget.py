@@ -8,24 +8,27 @@ from PySide2.QtGui import QRegExpValidator
 from PySide2.QtWidgets import QGridLayout, QVBoxLayout, QSizePolicy, QSpacerItem
 from PySide2.QtWidgets import QWidget, QComboBox, QPushButton
 
-from . import utils
 from .expr_parm_widget import ExprParmWidget
-from .storage import Storage
+from .expression import compileExpression
+from .storage import openStorage
 
 DEFAULT_EXPR = 'v * k'
-EXPR_PATTERN = r'[()\.\w\/\*\-\+_% ]*'
-EXPR_VAR_PATTERN = r'[a-zA-Z_]\w*'
+EXPR_PATTERN = r'[()\.\w\/\*\-\+_%, ]*'
 
-storage = Storage()
+storage = openStorage()
 
 
 class ExprWidget(QWidget):
     needPreview = Signal()
+    interactionStarted = Signal()
+    interactionFinished = Signal()
 
     def __init__(self):
         super(ExprWidget, self).__init__()
 
         self._var_parms = {}
+        self._expression = compileExpression(DEFAULT_EXPR)
+        self._error = None
 
         main_layout = QGridLayout(self)
         main_layout.setContentsMargins(4, 4, 4, 4)
@@ -37,10 +40,9 @@ class ExprWidget(QWidget):
         self._expr_field.setEditable(True)
         line_edit = self._expr_field.lineEdit()
         line_edit.setStyleSheet(hou.qt.styleSheet())
-        for preset in storage.presets:
-            self._expr_field.addItem(preset)
+        self._reloadPresets()
         self._expr_field.setCurrentText(DEFAULT_EXPR)
-        self._expr_field.currentTextChanged.connect(self.needPreview)
+        self._expr_field.currentTextChanged.connect(self._onExprChanged)
         main_layout.addWidget(self._expr_field, 0, 0)
 
         self._create_parms_button = QPushButton()
@@ -80,27 +82,53 @@ class ExprWidget(QWidget):
         """Returns expression."""
         return self._expr_field.currentText()
 
+    def _onExprChanged(self, text):
+        """Compiles the new expression once and reports its syntax errors."""
+        self._expression = compileExpression(text)
+        self._setError(self._expression.error)
+        self.needPreview.emit()
+
+    def _setError(self, message):
+        """Shows the error in the status bar only when it differs from the shown one."""
+        if message == self._error:
+            return
+
+        if message:
+            hou.ui.setStatusMessage(message, hou.severityType.Error)
+        else:
+            try:
+                text, severity = hou.ui.statusMessage()
+                if text.startswith('Error:'):
+                    hou.ui.setStatusMessage('')
+            except AttributeError:
+                hou.ui.setStatusMessage('')
+        self._error = message
+
+    def _onVariableChanged(self):
+        self.needPreview.emit()
+
     def _removeVariable(self, name):
         """Removes the variable by name. Used on parm widget destruction."""
         self._var_parms.pop(name, None)
-        self.needPreview.emit()
+        self._onVariableChanged()
 
     def _createVarParm(self, name, value):
         parm = ExprParmWidget(name, value)
         parm.removed.connect(self._removeVariable)
-        parm.valueChanged.connect(self.needPreview)
+        parm.valueChanged.connect(self._onVariableChanged)
+        parm.interactionStarted.connect(self.interactionStarted)
+        parm.interactionFinished.connect(self.interactionFinished)
         return parm
 
     def createParms(self, values=None):
-        """Creates parameters for the expression variables, skipping existing."""
+        """
+        Creates parameters for the expression variables, skipping existing.
+        The value and the per-element names, like i and n, get no parameters.
+        """
         if values is None:
             values = {}
 
-        for match in re.finditer(EXPR_VAR_PATTERN, self.expr):
-            var_name = match.group()
-            if var_name == 'v':
-                continue
-
+        for var_name in self._expression.variables:
             if var_name in self._var_parms:
                 continue
 
@@ -109,46 +137,50 @@ class ExprWidget(QWidget):
             self._parms_layout.addWidget(parm)
 
     def removeAllParms(self):
-        for var_name, parm in self._var_parms.items():
+        for var_name, parm in list(self._var_parms.items()):
             self._removeVariable(var_name)
             parm.deleteLater()
 
-    def eval(self, value):
-        """Evaluates the expression for the given value."""
-        var_values = {name: parm.value for name, parm in self._var_parms.items()}
-        var_values['v'] = value
-        try:
-            value = eval(self.expr, {}, var_values)
-        except (NameError, AttributeError, ZeroDivisionError) as e:
-            hou.ui.setStatusMessage(str(e).replace('name', 'variable'), hou.severityType.Error)
-            return
-        except SyntaxError as e:
-            hou.ui.setStatusMessage(utils.markErrorInExpr(self.expr, e), hou.severityType.Error)
-            return
-        except Exception:
-            hou.ui.setStatusMessage('bad expression', hou.severityType.Error)
-            return
-
-        try:
-            text, severity = hou.ui.statusMessage()
-            if text.startswith('Error:'):
-                hou.ui.setStatusMessage('')
-        except AttributeError:
-            hou.ui.setStatusMessage('')
+    def variableValues(self):
+        """Returns values of the expression variables by name."""
+        return {name: parm.value for name, parm in self._var_parms.items()}
 
-        return value
+    def reportErrors(self, evaluator):
+        """Reports the errors of the evaluation pass as a single message."""
+        self._setError(evaluator.errorSummary())
 
-    def saveToHistory(self, parm_name):
+    def saveToHistory(self, parm_name, node_type=None):
         """Saves current expression and variable values to the history."""
         data = {
             'expression': self.expr,
             'variables': {name: parm.value for name, parm in self._var_parms.items()}
         }
-        storage.addToHistory(parm_name, data)
+        storage.addToHistory(parm_name, data, node_type)
+
+    def _reloadPresets(self):
+        """Fills the expression list with the stored presets, keeping the current text."""
+        text = self._expr_field.currentText()
+        self._expr_field.blockSignals(True)
+        try:
+            self._expr_field.clear()
+            self._expr_field.addItems(storage.presets)
+            self._expr_field.setCurrentText(text)
+        finally:
+            self._expr_field.blockSignals(False)
+
+    def reset(self):
+        """Restores the default expression, reloads the presets and removes the variables."""
+        self.removeAllParms()
+        self._reloadPresets()
+        self._expr_field.setCurrentText(DEFAULT_EXPR)
+
+    def historyBatch(self):
+        """Returns context manager writing history changes at once on exit."""
+        return storage.batch()
 
-    def loadFromHistory(self, parm_name):
+    def loadFromHistory(self, parm_name, node_type=None):
         """Loads expression and variable values from the history."""
-        data = storage.setupFromHistory(parm_name)
+        data = storage.setupFromHistory(parm_name, node_type)
         if data is None:
             return
 
@@ -167,3 +199,4 @@ class ExprWidget(QWidget):
             storage.removePreset(self.expr)
         else:
             storage.addPreset(self.expr)
+        self._reloadPresets()
@@ -0,0 +1,394 @@
+from __future__ import division
+
+import __future__
+import ast
+import math
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import utils
+from .functions import ARRAY_GLOBALS, FUNCTION_NAMES, MASK, NAMES, SCALAR_GLOBALS, hash32
+
+VALUE_NAME = 'v'
+INDEX_NAME = 'i'
+COUNT_NAME = 'n'
+NODE_INDEX_NAME = 'ni'
+RANDOM_NAME = 'rand'
+ELEMENT_NAMES = (INDEX_NAME, COUNT_NAME, NODE_INDEX_NAME, RANDOM_NAME)
+CACHE_SIZE = 64
+INVALID_RESULT_ERROR = 'division by zero or invalid operation'
+
+_COMPILE_FLAGS = __future__.division.compiler_flag
+_LITERAL_TYPES = tuple(getattr(ast, name) for name in ('Constant', 'Num', 'Str') if name in vars(ast))
+_UNFOLDABLE_TYPES = tuple(getattr(ast, name) for name in ('Slice', 'Starred') if name in vars(ast))
+
+_cache = OrderedDict()
+
+
+def _compile(tree):
+    return compile(tree, '<expression>', 'eval', _COMPILE_FLAGS, True)
+
+
+def _names(node):
+    """Returns names used in the node in order of appearance."""
+    names = []
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and child.id not in names:
+            names.append(child.id)
+    return names
+
+
+def _unknownCall(tree):
+    """Returns the first call of a name that is not a known function."""
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and
+                node.func.id not in FUNCTION_NAMES and node.func.id != RANDOM_NAME):
+            return node
+
+
+def roundInteger(value):
+    """Rounds half up, the same way as the batch evaluation does."""
+    return int(math.floor(value + 0.5))
+
+
+def _toList(values):
+    """Returns the values as a list of Python numbers, so the scalar evaluation does not use NumPy arithmetic."""
+    if numpy is not None:
+        return numpy.asarray(values).tolist()
+    return list(values)
+
+
+def _isInvalidResult(result, value):
+    """Returns True if the result is complex, or is not finite while the value is, the same as the batch evaluation."""
+    if isinstance(result, complex):
+        return True
+    if not isinstance(result, float) or not (math.isinf(result) or math.isnan(result)):
+        return False
+    return not (math.isinf(value) or math.isnan(value))
+
+
+def randomValue(index, seed=0):
+    """Returns deterministic pseudo-random number in [0, 1) for the element index and the seed."""
+    seed = int(round(seed * 65536)) & MASK
+    return hash32((int(index) ^ hash32(seed)) & MASK) / 4294967296.
+
+
+def randomArray(indices, seed=0):
+    """Returns randomValue results for the array of indices, the seed can be an array too."""
+    seed = numpy.round(numpy.asarray(seed, numpy.float64) * 65536).astype(numpy.int64) & MASK
+    indices = numpy.asarray(indices).astype(numpy.int64) & MASK
+    with numpy.errstate(over='ignore'):
+        values = hash32((indices ^ hash32(seed.astype(numpy.uint32))).astype(numpy.uint32))
+    return values / 4294967296.
+
+
+def elementValues(count, indices=None, node_indices=None):
+    """
+    Returns values of the per-element names by name: the index, the number
+    of elements and the index of the node. Indices default to the element
+    order, node indices to zero.
+    """
+    if indices is None:
+        indices = numpy.arange(count) if numpy is not None else range(count)
+    if node_indices is None:
+        node_indices = numpy.zeros(len(indices), numpy.int64) if numpy is not None else [0] * len(indices)
+    return {
+        INDEX_NAME: indices,
+        COUNT_NAME: count,
+        NODE_INDEX_NAME: node_indices,
+    }
+
+
+def errorMessage(expr, exception):
+    """Returns user-friendly error message for the exception raised by the expression."""
+    if isinstance(exception, SyntaxError):
+        return utils.markErrorInExpr(expr, exception)
+    elif isinstance(exception, (NameError, AttributeError, ZeroDivisionError)):
+        return str(exception).replace('name', 'variable')
+    elif isinstance(exception, (TypeError, ValueError)):
+        return str(exception)
+    return 'bad expression'
+
+
+class _ConstantFolder(ast.NodeTransformer):
+    """
+    Replaces the largest subexpressions that do not depend on the varying
+    names with the names of the precomputed constants.
+    """
+
+    def __init__(self, varying):
+        self._varying = frozenset(varying)
+        self.constants = []
+
+    def visit(self, node):
+        if (isinstance(node, ast.expr) and
+                not isinstance(node, (ast.Name,) + _LITERAL_TYPES + _UNFOLDABLE_TYPES) and
+                self._varying.isdisjoint(_names(node))):
+            name = '_c{}'.format(len(self.constants))
+            self.constants.append((name, _compile(ast.Expression(body=node))))
+            return ast.copy_location(ast.Name(id=name, ctx=ast.Load()), node)
+        return self.generic_visit(node)
+
+
+class Expression(object):
+    """
+    Expression parsed and compiled once. Subexpressions that depend on the
+    variables only are folded into constants computed once per binding.
+    """
+
+    def __init__(self, text):
+        self._text = text
+        self._error = None
+        self._code = None
+        self._constants = ()
+        self._variables = ()
+        self._element_names = ()
+
+        try:
+            tree = ast.parse(text, mode='eval')
+        except SyntaxError as e:
+            self._error = errorMessage(text, e)
+            return
+
+        unknown_call = _unknownCall(tree)
+        if unknown_call is not None:
+            start = unknown_call.func.col_offset
+            self._error = 'unknown function {}: {}'.format(
+                unknown_call.func.id, utils.markErrorInExpr(text, start=start, end=start + len(unknown_call.func.id)))
+            return
+
+        names = _names(tree)
+        self._variables = tuple(name for name in names
+                                if name != VALUE_NAME and name not in ELEMENT_NAMES and name not in NAMES)
+        self._element_names = tuple(name for name in names if name in ELEMENT_NAMES)
+
+        folder = _ConstantFolder((VALUE_NAME,) + ELEMENT_NAMES)
+        tree = ast.fix_missing_locations(folder.visit(tree))
+        try:
+            self._code = _compile(tree)
+        except (SyntaxError, ValueError, TypeError) as e:
+            self._error = errorMessage(text, e)
+            return
+        self._constants = tuple(folder.constants)
+
+    @property
+    def text(self):
+        return self._text
+
+    @property
+    def error(self):
+        """Returns error message if the expression is invalid, otherwise None."""
+        return self._error
+
+    def isValid(self):
+        return self._error is None
+
+    @property
+    def variables(self):
+        """Returns names of the variables used in the expression, except the value and the per-element names."""
+        return self._variables
+
+    def usesElements(self):
+        """Returns True if the result depends on the element index, count or node, not only on the value."""
+        return bool(self._element_names)
+
+    def bind(self, variables):
+        """Returns evaluator bound to the given variable values."""
+        return BoundExpression(self, variables)
+
+
+class BoundExpression(object):
+    """
+    Callable evaluating the expression for a value. Errors are collected
+    instead of being raised, so they can be reported once per evaluation pass.
+    Results are memoized by value, so the bound expression should be reused
+    until the expression or the variable values change.
+    """
+
+    def __init__(self, expression, variables):
+        self._expression = expression
+        self._namespace = dict(variables)
+        self._bind_error = expression.error
+        self._memo = {}
+        self._failures = {}
+        self.error = None
+        self.error_count = 0
+        self.count = 0
+
+        if self._bind_error is not None:
+            return
+
+        for name, code in expression._constants:
+            try:
+                self._namespace[name] = eval(code, SCALAR_GLOBALS, self._namespace)
+            except Exception as e:
+                self._bind_error = errorMessage(expression.text, e)
+                return
+
+    @property
+    def expression(self):
+        return self._expression
+
+    def isValid(self):
+        return self._bind_error is None
+
+    def errorSummary(self):
+        """Returns the first error with the number of failed values or None."""
+        if self.error is None or self.error_count <= 1:
+            return self.error
+        return '{} ({} of {} values)'.format(self.error, self.error_count, self.count)
+
+    def _evaluate(self, value):
+        try:
+            return self._memo[value]
+        except KeyError:
+            pass
+
+        namespace = self._namespace
+        namespace[VALUE_NAME] = value
+        try:
+            result = eval(self._expression._code, SCALAR_GLOBALS, namespace)
+        except Exception as e:
+            result = None
+            self._failures[value] = errorMessage(self._expression.text, e)
+        else:
+            if _isInvalidResult(result, value):
+                result = None
+                self._failures[value] = INVALID_RESULT_ERROR
+        self._memo[value] = result
+        return result
+
+    def _evaluateElements(self, values, elements):
+        """Evaluates the values one by one with the per-element names, without memoization."""
+        namespace = dict(self._namespace)
+        namespace[COUNT_NAME] = elements[COUNT_NAME]
+        indices = _toList(elements[INDEX_NAME])
+        node_indices = _toList(elements[NODE_INDEX_NAME])
+        code = self._expression._code
+        results = []
+        for position, value in enumerate(values):
+            index = indices[position]
+            namespace[VALUE_NAME] = value
+            namespace[INDEX_NAME] = index
+            namespace[NODE_INDEX_NAME] = node_indices[position]
+            namespace[RANDOM_NAME] = lambda seed=0, index=index: randomValue(index, seed)
+            try:
+                result = eval(code, SCALAR_GLOBALS, namespace)
+            except Exception as e:
+                result = None
+                if self.error is None:
+                    self.error = errorMessage(self._expression.text, e)
+            else:
+                if _isInvalidResult(result, value):
+                    result = None
+                    if self.error is None:
+                        self.error = INVALID_RESULT_ERROR
+            results.append(result)
+        return results
+
+    def __call__(self, value, elements=None):
+        """Returns result for the value or None if evaluation failed."""
+        return self.evaluateMany((value,), elements=elements)[0]
+
+    def evaluateMany(self, values, integers=None, elements=None):
+        """
+        Returns results for the values, None for the failed ones. Results
+        for the values flagged in integers are rounded to int. Each unique
+        value is evaluated once. The unique values are evaluated at once
+        if NumPy is available and the expression supports arrays, otherwise
+        one by one. If the expression uses the per-element names, their
+        values are taken from elements, see elementValues, and every value
+        is evaluated.
+        """
+        self.count = len(values)
+        self.error = None
+        self.error_count = 0
+
+        if self._bind_error is not None:
+            if len(values):
+                self.error = self._bind_error
+                self.error_count = len(values)
+            return [None] * len(values)
+
+        if self._expression.usesElements() and elements is None:
+            elements = elementValues(len(values))
+        elif not self._expression.usesElements():
+            elements = None
+
+        results = None
+        if numpy is not None and len(values) > 1:
+            results = self._evaluateArray(values, integers, elements)
+
+        if results is None:
+            values = _toList(values)
+            if elements is not None:
+                results = self._evaluateElements(values, elements)
+            else:
+                results = [self._evaluate(value) for value in values]
+            if integers is not None:
+                for index, result in enumerate(results):
+                    if result is not None and integers[index]:
+                        results[index] = roundInteger(result)
+
+            self.error_count = results.count(None)
+            if self.error_count and self.error is None:
+                self.error = self._failures[values[results.index(None)]]
+        return results
+
+    def _evaluateArray(self, values, integers, elements=None):
+        array = numpy.asarray(values, dtype=numpy.float64)
+        namespace = dict(self._namespace)
+        if elements is None:
+            unique, inverse = numpy.unique(array, return_inverse=True)
+            namespace[VALUE_NAME] = unique
+        else:
+            indices = numpy.asarray(elements[INDEX_NAME])
+            namespace[VALUE_NAME] = unique = array
+            namespace[INDEX_NAME] = indices
+            namespace[COUNT_NAME] = elements[COUNT_NAME]
+            namespace[NODE_INDEX_NAME] = numpy.asarray(elements[NODE_INDEX_NAME])
+            namespace[RANDOM_NAME] = lambda seed=0: randomArray(indices, seed)
+        try:
+            with numpy.errstate(all='ignore'):
+                result = eval(self._expression._code, ARRAY_GLOBALS, namespace)
+                result = numpy.asarray(result, dtype=numpy.float64)
+                result = numpy.broadcast_to(result, unique.shape)
+                if elements is None:
+                    result = result[inverse.reshape(array.shape)]
+                else:
+                    result = result.copy()
+        except Exception:
+            return  # Not vectorizable, fall back to scalar evaluation
+
+        failed = ~numpy.isfinite(result) & numpy.isfinite(array)
+        if integers is not None:
+            integers = numpy.asarray(integers, dtype=bool) & ~failed
+            result[integers] = numpy.floor(result[integers] + 0.5)
+
+        results = result.tolist()
+        if integers is not None:
+            for index in numpy.flatnonzero(integers).tolist():
+                results[index] = int(results[index])
+
+        self.error_count = int(numpy.count_nonzero(failed))
+        if self.error_count:
+            self.error = INVALID_RESULT_ERROR
+            for index in numpy.flatnonzero(failed).tolist():
+                results[index] = None
+        return results
+
+
+def compileExpression(text):
+    """Returns compiled expression, reusing recently compiled ones."""
+    try:
+        expression = _cache.pop(text)
+    except KeyError:
+        expression = Expression(text)
+    _cache[text] = expression
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return expression
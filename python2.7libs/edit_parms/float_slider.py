@@ -1,10 +1,13 @@
 import hou
-from PySide2.QtCore import Qt, QEvent
+from PySide2.QtCore import Qt, QEvent, Signal
 from PySide2.QtGui import QMouseEvent
 from PySide2.QtWidgets import QSlider
 
 
 class FloatSlider(QSlider):
+    interactionStarted = Signal()
+    interactionFinished = Signal()
+
     _float_factor = 100.
 
     def __init__(self, minimum=0, maximum=100, default=0, orientation=Qt.Horizontal, parent=None):
@@ -13,6 +16,7 @@ class FloatSlider(QSlider):
         self._default_value = default * self._float_factor
         self.setValue(default)
         self._value_ladder_active = False
+        self._dragging = False
 
     def revertToDefault(self):
         self.setValue(self._default_value)
@@ -49,6 +53,8 @@ class FloatSlider(QSlider):
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
+            self._dragging = True
+            self.interactionStarted.emit()
             event = QMouseEvent(QEvent.MouseButtonPress, event.pos(),
                                 Qt.MiddleButton, Qt.MiddleButton, Qt.NoModifier)
             super(FloatSlider, self).mousePressEvent(event)
@@ -67,6 +73,7 @@ class FloatSlider(QSlider):
                 hou.ui.openValueLadder(self.value(), self.setValue,
                                        data_type=hou.valueLadderDataType.Float)
                 self._value_ladder_active = True
+                self.interactionStarted.emit()
         else:
             super(FloatSlider, self).mouseMoveEvent(event)
 
@@ -75,7 +82,11 @@ class FloatSlider(QSlider):
             if self._value_ladder_active:
                 self._value_ladder_active = False
                 hou.ui.closeValueLadder()
+                self.interactionFinished.emit()
             elif event.modifiers() & Qt.ControlModifier:
                 self.revertToDefault()
         else:
             super(FloatSlider, self).mouseReleaseEvent(event)
+            if event.button() == Qt.LeftButton and self._dragging:
+                self._dragging = False
+                self.interactionFinished.emit()
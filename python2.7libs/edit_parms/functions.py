@@ -0,0 +1,203 @@
+"""
+Functions available in the expressions. Every function has a scalar
+implementation, used when values are evaluated one by one, and an array
+implementation working on NumPy arrays element-wise, used for the batch
+evaluation. Argument order follows VEX.
+"""
+from __future__ import division
+
+import math
+from functools import reduce
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MASK = 0xffffffff
+MEMO_SIZE = 4096
+
+
+def hash32(value):
+    """Mixes bits of 32-bit unsigned integers, works for ints and NumPy uint32 arrays alike."""
+    value = (value ^ 61) ^ (value >> 16)
+    value = (value + (value << 3)) & MASK
+    value = value ^ (value >> 4)
+    value = (value * 0x27d4eb2d) & MASK
+    return value ^ (value >> 15)
+
+
+def _memoize(function):
+    """
+    Caches results of the pure Python scalar function by arguments, the
+    cache is dropped when full. C functions like math.sin are faster than
+    the lookup and are used directly.
+    """
+    memo = {}
+
+    def memoized(*args):
+        try:
+            return memo[args]
+        except KeyError:
+            pass
+        except TypeError:  # Unhashable arguments
+            return function(*args)
+
+        if len(memo) >= MEMO_SIZE:
+            memo.clear()
+        result = memo[args] = function(*args)
+        return result
+
+    memoized.__name__ = function.__name__
+    memoized.__doc__ = function.__doc__
+    return memoized
+
+
+def _clamp(value, minimum=0, maximum=1):
+    return min(max(value, minimum), maximum)
+
+
+def _fit(value, old_min, old_max, new_min=0, new_max=1):
+    if old_max == old_min:
+        return new_min
+    amount = _clamp((value - old_min) / (old_max - old_min))
+    return new_min + (new_max - new_min) * amount
+
+
+def _fit01(value, new_min, new_max):
+    return new_min + (new_max - new_min) * _clamp(value)
+
+
+def _lerp(first, second, amount):
+    return first + (second - first) * amount
+
+
+def _smooth(minimum, maximum, value):
+    if maximum == minimum:
+        return float(value >= maximum)
+    amount = _clamp((value - minimum) / (maximum - minimum))
+    return amount * amount * (3 - 2 * amount)
+
+
+def _round(value):
+    return math.floor(value + 0.5)
+
+
+def _sign(value):
+    return (value > 0) - (value < 0)
+
+
+def _latticeValue(cell):
+    return hash32(int(cell) & MASK) / 4294967296.
+
+
+def _noise(value):
+    cell = math.floor(value)
+    amount = value - cell
+    amount = amount * amount * (3 - 2 * amount)
+    return _lerp(_latticeValue(cell), _latticeValue(cell + 1), amount)
+
+
+SCALAR_FUNCTIONS = {
+    'int': int,
+    'float': float,
+    'abs': abs,
+    'min': min,
+    'max': max,
+    'pow': pow,
+    'sin': math.sin,
+    'cos': math.cos,
+    'tan': math.tan,
+    'asin': math.asin,
+    'acos': math.acos,
+    'atan': math.atan,
+    'atan2': math.atan2,
+    'sqrt': math.sqrt,
+    'exp': math.exp,
+    'log': math.log,
+    'floor': math.floor,
+    'ceil': math.ceil,
+    'round': _round,
+    'sign': _sign,
+    'radians': math.radians,
+    'degrees': math.degrees,
+    'clamp': _clamp,
+    'fit': _fit,
+    'fit01': _fit01,
+    'lerp': _lerp,
+    'smooth': _memoize(_smooth),
+    'noise': _memoize(_noise),
+}
+
+CONSTANTS = {
+    'pi': math.pi,
+}
+
+FUNCTION_NAMES = frozenset(SCALAR_FUNCTIONS)
+NAMES = FUNCTION_NAMES | frozenset(CONSTANTS)
+
+SCALAR_GLOBALS = dict(SCALAR_FUNCTIONS, **CONSTANTS)
+ARRAY_GLOBALS = dict(SCALAR_GLOBALS)
+
+if numpy is not None:
+    def _arrayClamp(value, minimum=0, maximum=1):
+        return numpy.minimum(numpy.maximum(value, minimum), maximum)
+
+    def _arrayFit(value, old_min, old_max, new_min=0, new_max=1):
+        old_range = numpy.asarray(old_max - old_min, numpy.float64)
+        safe_range = numpy.where(old_range == 0, 1, old_range)
+        amount = numpy.where(old_range == 0, 0, _arrayClamp((value - old_min) / safe_range))
+        return new_min + (new_max - new_min) * amount
+
+    def _arrayFit01(value, new_min, new_max):
+        return new_min + (new_max - new_min) * _arrayClamp(value)
+
+    def _arraySmooth(minimum, maximum, value):
+        value_range = numpy.asarray(maximum - minimum, numpy.float64)
+        safe_range = numpy.where(value_range == 0, 1, value_range)
+        amount = _arrayClamp((value - minimum) / safe_range)
+        return numpy.where(value_range == 0, numpy.asarray(value >= maximum, numpy.float64),
+                           amount * amount * (3 - 2 * amount))
+
+    def _arrayLatticeValue(cell):
+        cells = cell.astype(numpy.int64) & MASK
+        with numpy.errstate(over='ignore'):
+            return hash32(cells.astype(numpy.uint32)) / 4294967296.
+
+    def _arrayNoise(value):
+        value = numpy.asarray(value, numpy.float64)
+        cell = numpy.floor(value)
+        amount = value - cell
+        amount = amount * amount * (3 - 2 * amount)
+        return _lerp(_arrayLatticeValue(cell), _arrayLatticeValue(cell + 1), amount)
+
+    ARRAY_GLOBALS.update({
+        'int': numpy.trunc,
+        'float': lambda value: numpy.asarray(value, numpy.float64),
+        'abs': numpy.abs,
+        'min': lambda *values: reduce(numpy.minimum, values),
+        'max': lambda *values: reduce(numpy.maximum, values),
+        'pow': numpy.power,
+        'sin': numpy.sin,
+        'cos': numpy.cos,
+        'tan': numpy.tan,
+        'asin': numpy.arcsin,
+        'acos': numpy.arccos,
+        'atan': numpy.arctan,
+        'atan2': numpy.arctan2,
+        'sqrt': numpy.sqrt,
+        'exp': numpy.exp,
+        'log': numpy.log,
+        'floor': numpy.floor,
+        'ceil': numpy.ceil,
+        'round': lambda value: numpy.floor(numpy.asarray(value) + 0.5),
+        'sign': numpy.sign,
+        'radians': numpy.radians,
+        'degrees': numpy.degrees,
+        'clamp': _arrayClamp,
+        'fit': _arrayFit,
+        'fit01': _arrayFit01,
+        'lerp': _lerp,
+        'smooth': _arraySmooth,
+        'noise': _arrayNoise,
+    })
@@ -0,0 +1,194 @@
+import re
+from fnmatch import fnmatchcase
+
+import hou
+
+EDITABLE_TEMPLATE_TYPES = (hou.parmTemplateType.Int, hou.parmTemplateType.Float)
+
+
+def parmEntry(parm):
+    """
+    Returns (parm, initial value, integer flag) entry for the parameter
+    or None if the parameter can not be edited.
+    """
+    if not parm or parm.isLocked():
+        return
+
+    template_type = parm.parmTemplate().type()
+    if template_type not in EDITABLE_TEMPLATE_TYPES:
+        return
+
+    return parm, parm.eval(), template_type == hou.parmTemplateType.Int
+
+
+def nodeParmEntries(node, parm_name=None):
+    """
+    Returns entries for the editable parameters of the node. If parm_name is
+    given, only this parameter is looked up by name. Otherwise parameter
+    types are checked once per tuple before evaluating anything.
+    """
+    if parm_name:
+        entry = parmEntry(node.parm(parm_name))
+        return [entry] if entry else []
+
+    entries = []
+    for parm_tuple in node.parmTuples():
+        template_type = parm_tuple.parmTemplate().type()
+        if template_type not in EDITABLE_TEMPLATE_TYPES:
+            continue
+
+        is_integer = template_type == hou.parmTemplateType.Int
+        for parm, value in zip(parm_tuple, parm_tuple.eval()):
+            if not parm.isLocked():
+                entries.append((parm, value, is_integer))
+    return entries
+
+
+def iterNodeEntries(node_paths, parm_name=None, batch_size=256):
+    """
+    Yields (number of processed nodes, entries) pairs for the nodes at the
+    paths, collecting entries into batches of at least batch_size.
+    The last pair holds the remaining entries.
+    """
+    entries = []
+    done = 0
+    for done, node_path in enumerate(node_paths, 1):
+        node = hou.node(node_path)
+        if node is not None:
+            entries.extend(nodeParmEntries(node, parm_name))
+
+        if len(entries) >= batch_size:
+            yield done, entries
+            entries = []
+    yield done, entries
+
+
+def _isGlob(pattern):
+    return any(char in pattern for char in '*?[')
+
+
+def _walk(node, parts, index):
+    if index == len(parts):
+        yield node
+        return
+
+    part = parts[index]
+    if part == '**':
+        for match in _walk(node, parts, index + 1):
+            yield match
+        for child in node.children():
+            for match in _walk(child, parts, index):
+                yield match
+    elif not _isGlob(part):
+        child = node.node(part)
+        if child is not None:
+            for match in _walk(child, parts, index + 1):
+                yield match
+    else:
+        for child in node.children():
+            if fnmatchcase(child.name(), part):
+                for match in _walk(child, parts, index + 1):
+                    yield match
+
+
+def matchNodes(path_pattern, node_type_pattern=None):
+    """
+    Returns nodes matching the path glob, like /obj/geo*/xform*. Every
+    level is matched against the child names only, ** matches any number
+    of levels. Optionally nodes are filtered by the type name glob.
+    """
+    parts = [part for part in path_pattern.split('/') if part]
+    nodes = []
+    seen = set()
+    for node in _walk(hou.node('/'), parts, 0):
+        path = node.path()
+        if path in seen:
+            continue
+        seen.add(path)
+
+        if node_type_pattern and not fnmatchcase(node.type().name(), node_type_pattern):
+            continue
+        nodes.append(node)
+    return nodes
+
+
+class ParmNameIndex(object):
+    """
+    Editable parameters matching the name pattern. Names of the template
+    parameters are collected once per node type, spare parameters and
+    multiparm instances differ per node and are looked up on every node.
+    The pattern is a list of globs separated by | or spaces, like t?|r?.
+    An index is meant for a single bind call, as node types can change.
+    """
+
+    def __init__(self, parm_pattern):
+        self._patterns = [pattern for pattern in re.split(r'[|\s]+', parm_pattern) if pattern]
+        self._names = {}
+
+    def _matches(self, name):
+        return any(fnmatchcase(name, pattern) for pattern in self._patterns)
+
+    def _typeNames(self, node):
+        """Returns names of the matching template parameters and of the multiparm parents for the node type."""
+        key = node.type().nameWithCategory()
+        names = self._names.get(key)
+        if names is None:
+            parm_names = []
+            parent_names = []
+            for parm_tuple in node.parmTuples():
+                if parm_tuple.isSpare() or parm_tuple.isMultiParmInstance():
+                    continue
+                if parm_tuple[0].isMultiParmParent():
+                    parent_names.append(parm_tuple[0].name())
+                elif parm_tuple.parmTemplate().type() in EDITABLE_TEMPLATE_TYPES:
+                    parm_names.extend(parm.name() for parm in parm_tuple if self._matches(parm.name()))
+            names = self._names[key] = (tuple(parm_names), tuple(parent_names))
+        return names
+
+    def _matchingParms(self, parms):
+        """Yields the matching parameters, expanding instances of the nested multiparms."""
+        for parm in parms:
+            if parm.isMultiParmParent():
+                for instance in self._matchingParms(parm.multiParmInstances()):
+                    yield instance
+            elif parm.parmTemplate().type() in EDITABLE_TEMPLATE_TYPES and self._matches(parm.name()):
+                yield parm
+
+    def parms(self, node):
+        """Returns the matching parameters of the node."""
+        parm_names, parent_names = self._typeNames(node)
+        parms = [node.parm(name) for name in parm_names]
+        for name in parent_names:
+            parent = node.parm(name)
+            if parent is not None:
+                parms.extend(self._matchingParms(parent.multiParmInstances()))
+        parms.extend(self._matchingParms(node.spareParms()))
+        return parms
+
+    def entries(self, node):
+        """Returns entries for the matching parameters of the node."""
+        entries = []
+        seen = set()
+        for parm in self.parms(node):
+            if parm is None or parm in seen:
+                continue
+            seen.add(parm)
+            entry = parmEntry(parm)
+            if entry:
+                entries.append(entry)
+        return entries
+
+
+def iterIndexEntries(nodes, index, batch_size=256):
+    """
+    Yields (number of processed nodes, entries) pairs for the nodes using
+    the parameter name index. The last pair holds the remaining entries.
+    """
+    entries = []
+    done = 0
+    for done, node in enumerate(nodes, 1):
+        entries.extend(index.entries(node))
+        if len(entries) >= batch_size:
+            yield done, entries
+            entries = []
+    yield done, entries
@@ -0,0 +1,150 @@
+from collections import namedtuple
+
+KeyField = namedtuple('KeyField', 'key setter original kind')
+
+VALUE = 'value'
+SLOPE = 'slope'
+FRAME = 'frame'
+
+
+def _keyFields(key):
+    """Returns fields of the keyframe that hold values, slopes and the frame."""
+    fields = []
+    if key.isValueSet():
+        fields.append(KeyField(key, key.setValue, key.value(), VALUE))
+        if not key.isValueTied():
+            fields.append(KeyField(key, key.setInValue, key.inValue(), VALUE))
+    if key.isSlopeSet():
+        fields.append(KeyField(key, key.setSlope, key.slope(), SLOPE))
+        if not key.isSlopeTied():
+            fields.append(KeyField(key, key.setInSlope, key.inSlope(), SLOPE))
+    fields.append(KeyField(key, key.setFrame, key.frame(), FRAME))
+    return fields
+
+
+class KeyframeEditor(object):
+    """
+    Edits keyframes of the animated parameters. Keyframes are captured once
+    per parameter before the first change, fields of all the keys are
+    evaluated in a single batch and written back with one setKeyframes call
+    per parameter. The expression is applied to the key values and,
+    optionally, to the slopes and the frames.
+    """
+
+    def __init__(self):
+        self._keys = {}
+        self._fields = {}
+        self._written = {}
+        self._retimed = set()
+        self._kinds = frozenset((VALUE,))
+
+    def clear(self):
+        """Forgets the captured keyframes without restoring them."""
+        self._keys.clear()
+        self._fields.clear()
+        self._written.clear()
+        self._retimed.clear()
+
+    def setOptions(self, slopes=False, times=False):
+        """Selects whether slopes and frames are edited along with the values."""
+        kinds = [VALUE]
+        if slopes:
+            kinds.append(SLOPE)
+        if times:
+            kinds.append(FRAME)
+        self._kinds = frozenset(kinds)
+
+    def keyframes(self, parm):
+        """Returns keyframes of the parameter captured before editing, empty if it is not animated."""
+        keys = self._keys.get(parm)
+        if keys is None:
+            keys = self._keys[parm] = tuple(parm.keyframes())
+            self._fields[parm] = [field for key in keys for field in _keyFields(key)]
+        return keys
+
+    def isAnimated(self, parm):
+        return bool(self.keyframes(parm))
+
+    def animatedRows(self, registry):
+        """Returns rows of the animated parameters."""
+        return [row for row, parm in enumerate(registry.parms()) if self.isAnimated(parm)]
+
+    def hasChanges(self):
+        """Returns True if keyframes of some parameter differ from the captured ones."""
+        return bool(self._written)
+
+    def fieldValues(self, registry, rows):
+        """
+        Returns original values of the edited fields of the parameters
+        at the rows, the flags marking the integer ones and the rows of
+        the fields, as flat lists to be evaluated in a single batch.
+        """
+        values = []
+        integers = []
+        field_rows = []
+        for row in rows:
+            is_integer = registry.isInteger(row)
+            for field in self._fields[registry.parm(row)]:
+                if field.kind in self._kinds:
+                    values.append(field.original)
+                    integers.append(is_integer and field.kind == VALUE)
+                    field_rows.append(row)
+        return values, integers, field_rows
+
+    def splitResults(self, registry, rows, results):
+        """Returns new field values by parameter from the flat results of fieldValues."""
+        new_values = {}
+        index = 0
+        for row in rows:
+            parm = registry.parm(row)
+            parm_values = []
+            for field in self._fields[parm]:
+                value = None
+                if field.kind in self._kinds:
+                    value = results[index]
+                    index += 1
+                parm_values.append(field.original if value is None else value)
+            new_values[parm] = tuple(parm_values)
+        return new_values
+
+    def write(self, parm, values=None):
+        """
+        Writes new field values to the keyframes of the parameter, restores
+        the captured keyframes if values are None. Returns 1 if the keyframes
+        were changed, otherwise 0.
+        """
+        fields = self._fields.get(parm)
+        if not fields:
+            return 0
+
+        originals = tuple(field.original for field in fields)
+        if values is None:
+            values = originals
+        if values == self._written.get(parm, originals):
+            return 0
+
+        retimed = False
+        for field, value in zip(fields, values):
+            field.setter(value)
+            retimed = retimed or (field.kind == FRAME and value != field.original)
+
+        if retimed or parm in self._retimed:
+            parm.deleteAllKeyframes()
+        parm.setKeyframes(self._keys[parm])
+
+        if retimed:
+            self._retimed.add(parm)
+        else:
+            self._retimed.discard(parm)
+        if values == originals:
+            self._written.pop(parm, None)
+        else:
+            self._written[parm] = values
+        return 1
+
+    def forget(self, parm):
+        """Drops the captured keyframes of the parameter."""
+        self._keys.pop(parm, None)
+        self._fields.pop(parm, None)
+        self._written.pop(parm, None)
+        self._retimed.discard(parm)
@@ -0,0 +1,290 @@
+"""
+Live links drive the bound parameters by a driver parameter through the
+expression, with v holding the driver value, instead of a channel
+expression on every parameter. Driver changes come from node and playbar
+events and are coalesced into a single batched write per idle tick of
+the event loop, so scrubbing an animated driver costs one write pass per
+frame. Links live for the session and are dropped when the scene is
+cleared.
+"""
+import hou
+from PySide2.QtCore import QObject, QTimer
+
+from . import profiling
+from .engine import Engine
+
+_manager = None
+
+
+class LiveLink(object):
+    """Engine of the driven parameters with the last propagated driver value."""
+
+    def __init__(self, driver, engine):
+        self._driver = driver
+        self._engine = engine
+        self._value = None
+
+    def driver(self):
+        return self._driver
+
+    def engine(self):
+        return self._engine
+
+    def __len__(self):
+        """Returns number of the driven parameters, the bound driver is not counted."""
+        registry = self._engine.registry()
+        return len(registry) - (self._driver in registry)
+
+    def isDrivenBy(self, node, parm_tuple=None):
+        """Returns True if the driver belongs to the node and to the tuple if it is given."""
+        driver = self._driver
+        return driver.node() == node and (parm_tuple is None or driver.tuple() == parm_tuple)
+
+    def update(self, force=False):
+        """
+        Writes the parameters without undo actions if the driver value
+        changed since the last update. Raises hou.ObjectWasDeleted if the
+        driver is deleted. Returns True if the parameters were written.
+        """
+        value = self._driver.eval()
+        if value == self._value and not force:
+            return False
+
+        self._value = value
+        try:
+            self._engine.preview()
+        except hou.ObjectWasDeleted:
+            self.prune()
+            self._engine.preview()
+        return True
+
+    def discardNodes(self, node_paths):
+        """Unbinds parameters of the nodes with the paths. Returns number of the unbound parameters."""
+        registry = self._engine.registry()
+        rows = [row for row, path in enumerate(registry.paths()) if path.rpartition('/')[0] in node_paths]
+        self._engine.discard(rows)
+        return len(rows)
+
+    def prune(self):
+        """Unbinds parameters of the deleted nodes, found by probing every parameter."""
+        rows = []
+        for row, parm in enumerate(self._engine.registry().parms()):
+            try:
+                parm.node()
+            except hou.ObjectWasDeleted:
+                rows.append(row)
+        self._engine.discard(rows)
+
+
+class LinkManager(QObject):
+    """
+    Keeps the live links of the session. While there are links, listens to
+    parameter changes and deletion of the driver nodes, deletion of the
+    driven nodes and frame changes. Changed links are updated together on
+    the next idle tick, or by flush.
+    """
+
+    DRIVER_EVENTS = (hou.nodeEventType.ParmTupleChanged, hou.nodeEventType.BeingDeleted)
+    TARGET_EVENTS = (hou.nodeEventType.BeingDeleted,)
+
+    def __init__(self, parent=None):
+        super(LinkManager, self).__init__(parent)
+        self._links = {}
+        self._dirty = set()
+        self._deleted_paths = set()
+        self._driver_nodes = set()
+        self._target_nodes = set()
+        self._playbar_callback = False
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+
+        hou.hipFile.addEventCallback(self._onHipFileEvent)
+
+    def link(self, driver, parms, expression, variables=None):
+        """
+        Links the parameters to the driver, replacing its previous link, and
+        writes them right away. The driver stays bound, so i, n and ni are
+        the same as in the editor, but is never driven. Raises ValueError if
+        the expression is not valid. Returns the link.
+        """
+        engine = Engine()
+        engine.setExpression(expression)
+        engine.setVariables(variables or {})
+        if engine.evaluator() is None:
+            raise ValueError(engine.errorSummary() or 'expression is empty')
+
+        engine.bind(parms)
+        engine.setDriver(driver)
+
+        self._links.pop(driver, None)
+        link = self._links[driver] = LiveLink(driver, engine)
+        self._updateCallbacks()
+        link.update(force=True)
+        return link
+
+    def unlink(self, driver):
+        """Removes link of the driver, the parameters keep the last values. Returns False if there is none."""
+        if self._links.pop(driver, None) is None:
+            return False
+
+        self._dirty.discard(driver)
+        self._updateCallbacks()
+        return True
+
+    def unlinkParm(self, parm):
+        """
+        Removes link of the driver parameter or unbinds the driven parameter
+        from its links. Returns number of the affected links.
+        """
+        if self.unlink(parm):
+            return 1
+
+        count = 0
+        for driver, link in list(self._links.items()):
+            row = link.engine().registry().row(parm)
+            if row is None:
+                continue
+            link.engine().discard((row,))
+            count += 1
+            if not len(link):
+                del self._links[driver]
+
+        if count:
+            self._updateCallbacks()
+        return count
+
+    def clear(self):
+        """Removes all the links."""
+        self._links.clear()
+        self._dirty.clear()
+        self._deleted_paths.clear()
+        self._timer.stop()
+        self._updateCallbacks()
+
+    def links(self):
+        return list(self._links.values())
+
+    def findLink(self, driver):
+        """Returns link of the driver parameter or None."""
+        return self._links.get(driver)
+
+    def isLinked(self, parm):
+        """Returns True if the parameter drives or is driven by a link."""
+        return parm in self._links or any(parm in link.engine().registry() for link in self._links.values())
+
+    def requestUpdate(self, driver=None):
+        """Schedules update of the driver link, or of all the links, on the next idle tick."""
+        self._dirty.update(self._links if driver is None else (driver,))
+        if not self._timer.isActive():
+            self._timer.start(0)
+
+    def flush(self):
+        """Drops parameters of the deleted nodes and updates the links with changed drivers."""
+        self._timer.stop()
+        dirty, self._dirty = self._dirty, set()
+        deleted_paths, self._deleted_paths = self._deleted_paths, set()
+        removed = False
+        with profiling.span('LinkManager.flush'):
+            for driver, link in list(self._links.items()):
+                if deleted_paths:
+                    link.discardNodes(deleted_paths)
+                alive = len(link) > 0
+                if alive and driver in dirty:
+                    try:
+                        link.update()
+                    except hou.ObjectWasDeleted:  # The driver node is deleted
+                        alive = False
+                if not alive or not len(link):
+                    del self._links[driver]
+                    removed = True
+
+        if removed or deleted_paths:
+            self._updateCallbacks()
+
+    def _updateCallbacks(self):
+        """Subscribes to events of the nodes the links depend on and drops the stale subscriptions."""
+        driver_nodes = set()
+        target_nodes = set()
+        for driver, link in self._links.items():
+            try:
+                driver_nodes.add(driver.node())
+            except hou.ObjectWasDeleted:
+                self._dirty.add(driver)  # Removed on flush
+            try:
+                target_nodes.update(_groupNodes(link))
+            except hou.ObjectWasDeleted:
+                link.prune()
+                target_nodes.update(_groupNodes(link))
+
+        _resubscribe(self._driver_nodes, driver_nodes, self.DRIVER_EVENTS, self._onDriverEvent)
+        _resubscribe(self._target_nodes, target_nodes, self.TARGET_EVENTS, self._onTargetDeleted)
+        self._driver_nodes = driver_nodes
+        self._target_nodes = target_nodes
+        self._setPlaybarCallback(bool(self._links))
+
+    def _setPlaybarCallback(self, enabled):
+        if enabled == self._playbar_callback or not hou.isUIAvailable():
+            return
+
+        self._playbar_callback = enabled
+        if enabled:
+            hou.playbar.addEventCallback(self._onPlaybarEvent)
+        else:
+            hou.playbar.removeEventCallback(self._onPlaybarEvent)
+
+    def _onDriverEvent(self, event_type, node, **kwargs):
+        parm_tuple = kwargs.get('parm_tuple')
+        for driver, link in self._links.items():
+            if link.isDrivenBy(node, parm_tuple):
+                self.requestUpdate(driver)
+
+    def _onTargetDeleted(self, event_type, node, **kwargs):
+        self._deleted_paths.add(node.path())
+        if not self._timer.isActive():
+            self._timer.start(0)
+
+    def _onPlaybarEvent(self, event_type, frame):
+        if event_type != hou.playbarEvent.FrameChanged:
+            return
+
+        for driver in self._links:
+            try:
+                time_dependent = driver.isTimeDependent()
+            except hou.ObjectWasDeleted:
+                time_dependent = True
+            if time_dependent:
+                self.requestUpdate(driver)
+
+    def _onHipFileEvent(self, event_type):
+        if self._links and event_type in (hou.hipFileEventType.BeforeClear, hou.hipFileEventType.BeforeLoad):
+            self.clear()
+
+
+def _groupNodes(link):
+    return set(group.parm_tuple.node() for group in link.engine().registry().groups())
+
+
+def _resubscribe(old_nodes, new_nodes, event_types, callback):
+    for node in old_nodes - new_nodes:
+        try:
+            node.removeEventCallback(event_types, callback)
+        except (hou.ObjectWasDeleted, hou.OperationFailed):
+            pass
+
+    for node in new_nodes - old_nodes:
+        node.addEventCallback(event_types, callback)
+
+
+def linkManager():
+    """Returns the link manager of the session, creating it on first use."""
+    global _manager
+    if _manager is None:
+        _manager = LinkManager()
+    return _manager
+
+
+def isLinked(parm):
+    """Returns True if the parameter drives or is driven by a link. Does not create the manager."""
+    return _manager is not None and _manager.isLinked(parm)
@@ -1,12 +1,20 @@
+from contextlib import contextmanager
+
 import hou
 from PySide2.QtCore import Qt
 from PySide2.QtGui import QKeySequence
 from PySide2.QtWidgets import QDialog, QAction
-from PySide2.QtWidgets import QGridLayout
-from PySide2.QtWidgets import QTabWidget, QPushButton
+from PySide2.QtWidgets import QGridLayout, QHBoxLayout
+from PySide2.QtWidgets import QWidget, QTabWidget, QPushButton, QCheckBox, QProgressBar, QLabel
+
+from . import profiling
 
+from .chunked_task import ChunkedTask
+from .cook_deferral import CookDeferral
+from .engine import Engine
 from .expr_widget import ExprWidget
 from .parms_widget import ParmsWidget
+from .preview_scheduler import PreviewScheduler
 
 HOUDINI_PARM_PATH_MIME_FORMAT = 'application/sidefx-houdini-parm.path'
 HOUDINI_NODE_PATH_MIME_FORMAT = 'application/sidefx-houdini-node.path'
@@ -33,28 +41,130 @@ class MainWindow(QDialog):
         self._expr = ExprWidget()
         self._tabs.addTab(self._expr, hou.qt.Icon('DATATYPES_code_function', 16, 16), 'Expression')
 
-        self._parm_list = ParmsWidget()
+        self._engine = Engine()
+
+        self._parm_list = ParmsWidget(self._engine)
         self._parm_list.sourceParmChanged.connect(self.updateWindowTitle)
         self._tabs.addTab(self._parm_list, hou.qt.Icon('NETVIEW_image_link_located', 16, 16), 'Parameters')
 
+        self._progress_widget = QWidget()
+        self._progress_widget.hide()
+        progress_layout = QHBoxLayout(self._progress_widget)
+        progress_layout.setContentsMargins(0, 0, 0, 0)
+        progress_layout.setSpacing(4)
+        layout.addWidget(self._progress_widget, 1, 0, 1, -1)
+
+        self._progress_bar = QProgressBar()
+        self._progress_bar.setTextVisible(True)
+        progress_layout.addWidget(self._progress_bar)
+
+        self._stop_button = QPushButton('Stop')
+        self._stop_button.setFocusPolicy(Qt.NoFocus)
+        self._stop_button.setToolTip('Stop binding parameters.')
+        progress_layout.addWidget(self._stop_button)
+
+        self._cook_deferral = CookDeferral(parent=self)
+
+        self._defer_cooking_toggle = QCheckBox('Defer cooking while dragging')
+        self._defer_cooking_toggle.setFocusPolicy(Qt.NoFocus)
+        self._defer_cooking_toggle.setToolTip('Hold cooking off during slider and value ladder drags\n'
+                                              'and update the scene once on release.')
+        self._defer_cooking_toggle.toggled.connect(self._cook_deferral.setEnabled)
+        layout.addWidget(self._defer_cooking_toggle, 2, 0, 1, -1)
+
+        keyframes_layout = QHBoxLayout()
+        keyframes_layout.setContentsMargins(0, 0, 0, 0)
+        keyframes_layout.setSpacing(4)
+        layout.addLayout(keyframes_layout, 3, 0, 1, -1)
+
+        self._keyframes_toggle = QCheckBox('Edit keyframes')
+        self._keyframes_toggle.setFocusPolicy(Qt.NoFocus)
+        self._keyframes_toggle.setToolTip('Apply the expression to the keyframes of animated parameters\n'
+                                          'instead of their values at the current frame.')
+        keyframes_layout.addWidget(self._keyframes_toggle)
+
+        self._slopes_toggle = QCheckBox('Slopes')
+        self._slopes_toggle.setFocusPolicy(Qt.NoFocus)
+        self._slopes_toggle.setToolTip('Apply the expression to the keyframe slopes too.')
+        self._slopes_toggle.setEnabled(False)
+        keyframes_layout.addWidget(self._slopes_toggle)
+
+        self._frames_toggle = QCheckBox('Frames')
+        self._frames_toggle.setFocusPolicy(Qt.NoFocus)
+        self._frames_toggle.setToolTip('Apply the expression to the keyframe frames too.')
+        self._frames_toggle.setEnabled(False)
+        keyframes_layout.addWidget(self._frames_toggle)
+        keyframes_layout.addStretch()
+
+        for toggle in (self._keyframes_toggle, self._slopes_toggle, self._frames_toggle):
+            toggle.toggled.connect(self._updateKeyframeMode)
+
+        self._live_link_toggle = QCheckBox('Live link to current parameter')
+        self._live_link_toggle.setFocusPolicy(Qt.NoFocus)
+        self._live_link_toggle.setToolTip('Drive the parameters by the current parameter through the expression,\n'
+                                          'with v holding its value. The link stays after applying.')
+        self._live_link_toggle.toggled.connect(self._updateLiveLink)
+        self._parm_list.sourceParmChanged.connect(self._updateLiveLink)
+        layout.addWidget(self._live_link_toggle, 4, 0, 1, -1)
+
+        profiling_layout = QHBoxLayout()
+        profiling_layout.setContentsMargins(0, 0, 0, 0)
+        profiling_layout.setSpacing(4)
+        layout.addLayout(profiling_layout, 5, 0, 1, -1)
+
+        self._profiling_toggle = QCheckBox('Profile')
+        self._profiling_toggle.setFocusPolicy(Qt.NoFocus)
+        self._profiling_toggle.setToolTip('Time expression evaluation, parameter writes and storage access.')
+        self._profiling_toggle.setChecked(profiling.isEnabled())
+        self._profiling_toggle.toggled.connect(self.setProfiling)
+        profiling_layout.addWidget(self._profiling_toggle)
+
+        self._profiling_readout = QLabel()
+        self._profiling_readout.setToolTip('Last duration and number of calls of the slowest operations.')
+        profiling_layout.addWidget(self._profiling_readout, 1)
+
+        self._export_trace_button = QPushButton()
+        self._export_trace_button.setFocusPolicy(Qt.NoFocus)
+        self._export_trace_button.setFixedWidth(self._export_trace_button.sizeHint().height())
+        self._export_trace_button.setIcon(hou.qt.Icon('BUTTONS_save', 16, 16))
+        self._export_trace_button.setToolTip('Save timings as a Chrome trace file.')
+        self._export_trace_button.clicked.connect(self._exportTrace)
+        profiling_layout.addWidget(self._export_trace_button)
+
         self._cancel_button = QPushButton('Cancel')
         self._cancel_button.setFocusPolicy(Qt.NoFocus)
         self._cancel_button.clicked.connect(self.reject)
-        layout.addWidget(self._cancel_button, 1, 0)
+        layout.addWidget(self._cancel_button, 6, 0)
 
         self._apply_button = QPushButton('Apply')
         self._apply_button.setFocusPolicy(Qt.NoFocus)
         self._apply_button.setDefault(True)
         self._apply_button.clicked.connect(self.accept)
-        layout.addWidget(self._apply_button, 1, 1)
+        layout.addWidget(self._apply_button, 6, 1)
 
-        self._expr.needPreview.connect(self.preview)
-        self._parm_list.needPreview.connect(self.preview)
+        self._preview_task = ChunkedTask(parent=self)
+        self._preview_task.progressChanged.connect(
+            lambda done, total: self._updateProgress(self._preview_task, 'Preview', done, total))
+        self._preview_task.finished.connect(self._hideProgress)
+        self._preview_task.finished.connect(self._updateProfilingReadout)
+
+        self._harvest_task = self._parm_list.harvestTask()
+        self._harvest_task.progressChanged.connect(
+            lambda done, total: self._updateProgress(self._harvest_task, 'Binding', done, total))
+        self._harvest_task.finished.connect(self._hideProgress)
+        self._stop_button.clicked.connect(self._harvest_task.cancel)
+
+        self._preview_scheduler = PreviewScheduler(self.preview, parent=self)
+        self._preview_task.finished.connect(self._finishPreviewRun)
+        self._expr.needPreview.connect(self.requestPreview)
+        self._parm_list.needPreview.connect(self.requestPreview)
+        self._expr.interactionStarted.connect(self._cook_deferral.begin)
+        self._expr.interactionFinished.connect(self._finishInteraction)
 
         if parms:
-            self._expr.loadFromHistory(parms[0].name())
-            self._parm_list.setSourceParm(parms[0])
-            self._parm_list.addParms(parms)
+            self.setParms(parms)
+
+        self._updateProfilingReadout()
 
         self._remove_library_action = QAction('Remove', self)
         self._remove_library_action.triggered.connect(self._parm_list.removeSelected)
@@ -62,37 +172,185 @@ class MainWindow(QDialog):
         self._remove_library_action.setShortcutContext(Qt.WidgetWithChildrenShortcut)
         self._parm_list.addAction(self._remove_library_action)
 
+    def setParms(self, parms):
+        """
+        Resets the dialog to edit the new parameters, so a hidden dialog
+        can be reused instead of building a new one. Live link and keyframe
+        modes are turned off, they apply to the previous parameters only.
+        """
+        self._live_link_toggle.setChecked(False)
+        self.setKeyframeMode(False)
+        self._preview_scheduler.cancel()
+        self._preview_task.cancel()
+        self._parm_list.clear()
+        self._engine.reset()
+        self._expr.reset()
+        self.setResult(QDialog.Rejected)
+        self.updateWindowTitle()
+
+        if not parms:
+            return
+
+        self._expr.loadFromHistory(parms[0].name(), parms[0].node().type().nameWithCategory())
+        self._parm_list.setSourceParm(parms[0])
+        self._parm_list.addParms(parms)
+
+    def setDeferCooking(self, enabled):
+        """Enables holding cooking off during interactive previews."""
+        self._defer_cooking_toggle.setChecked(enabled)
+
+    def setKeyframeMode(self, enabled, slopes=False, frames=False):
+        """Makes the expression edit keyframes of animated parameters, optionally slopes and frames."""
+        self._slopes_toggle.setChecked(slopes)
+        self._frames_toggle.setChecked(frames)
+        self._keyframes_toggle.setChecked(enabled)
+
+    def _updateKeyframeMode(self):
+        enabled = self._keyframes_toggle.isChecked()
+        self._slopes_toggle.setEnabled(enabled)
+        self._frames_toggle.setEnabled(enabled)
+        self._engine.setKeyframeMode(enabled, self._slopes_toggle.isChecked(), self._frames_toggle.isChecked())
+        self.requestPreview()
+
+    def setLiveLink(self, enabled):
+        """Makes the current parameter drive the others, they are linked to it when applied."""
+        self._live_link_toggle.setChecked(enabled)
+
+    def _updateLiveLink(self):
+        source_parm = self._parm_list.sourceParm()
+        enabled = self._live_link_toggle.isChecked() and source_parm is not None
+        self._engine.setDriver(source_parm if enabled else None)
+        self.requestPreview()
+
+    def _createLiveLink(self):
+        from .live_link import linkManager
+
+        driver = self._engine.driver()
+        try:
+            link = linkManager().link(driver, self._engine.registry().parms(),
+                                      self._expr.expr, self._expr.variableValues())
+        except ValueError as e:
+            hou.ui.setStatusMessage('Live link not created: {}'.format(e), hou.severityType.Error)
+            return
+        hou.ui.setStatusMessage('Linked {} parameters to {}'.format(len(link), driver.path()))
+
+    def setProfiling(self, enabled):
+        """Enables timing of the hot paths and shows the readout."""
+        profiling.setEnabled(enabled)
+        self._profiling_toggle.setChecked(enabled)
+        self._updateProfilingReadout()
+
+    def _updateProfilingReadout(self):
+        enabled = profiling.isEnabled()
+        self._profiling_readout.setVisible(enabled)
+        self._export_trace_button.setVisible(enabled)
+        if enabled:
+            self._profiling_readout.setText(profiling.summary())
+
+    def _exportTrace(self):
+        file_path = hou.ui.selectFile(title='Save Trace', default_value='editparms_trace.json',
+                                      pattern='*.json', chooser_mode=hou.fileChooserMode.Write)
+        if not file_path:
+            return
+
+        file_path = hou.expandString(file_path)
+        try:
+            count = profiling.exportTrace(file_path)
+        except (IOError, OSError) as e:
+            hou.ui.setStatusMessage('Trace not saved: {}'.format(e), hou.severityType.Error)
+            return
+        hou.ui.setStatusMessage('Saved {} trace events to {}'.format(count, file_path))
+
+    def _finishPreviewRun(self, completed):
+        """Passes duration of the whole sliced preview to the scheduler."""
+        if completed:
+            self._preview_scheduler.finishRun()
+
+    def _finishInteraction(self):
+        """Previews the final state and then lets the scene cook once."""
+        try:
+            self._preview_scheduler.flush()
+            self._preview_task.finish()
+        finally:
+            self._cook_deferral.end()
+
+    def requestPreview(self):
+        """Drops the unfinished preview pass and schedules a new one."""
+        self._preview_task.cancel()
+        self._preview_scheduler.request()
+
+    def _updateProgress(self, task, label, done, total):
+        if done >= total:
+            return
+
+        self._progress_bar.setMaximum(total)
+        self._progress_bar.setValue(done)
+        time_left = task.estimatedTimeLeft()
+        if time_left is None:
+            self._progress_bar.setFormat('{}: {}/{}'.format(label, done, total))
+        else:
+            self._progress_bar.setFormat('{}: {}/{}, {:.1f} s left'.format(label, done, total, time_left))
+        self._stop_button.setVisible(task is self._harvest_task)
+        self._progress_widget.show()
+
+    def _hideProgress(self):
+        if not self._preview_task.isRunning() and not self._harvest_task.isRunning():
+            self._progress_widget.hide()
+
+    def engine(self):
+        """Returns engine editing the bound parameters."""
+        return self._engine
+
+    def _syncEngine(self):
+        """Passes the expression and the variable values to the engine and returns its evaluator."""
+        self._engine.setExpression(self._expr.expr)
+        self._engine.setVariables(self._expr.variableValues())
+        return self._engine.evaluator()
+
+    @contextmanager
+    def _previewSlice(self):
+        """Disables undo for the preview writes and times them."""
+        with hou.undos.disabler(), profiling.span('MainWindow.previewSlice'):
+            yield
+
+    @profiling.timed('MainWindow.preview')
     def preview(self):
         """
         Sets new values to the parameters without adding actions
-        to the undo stack.
+        to the undo stack. Parameters already holding the new value
+        are skipped. Large lists are written in time slices between
+        the events, a newer preview cancels the unfinished one.
         """
-        with hou.undos.disabler():
-            for parm, data in self._parm_list.parms().items():
-                parm.set(self._expr.eval(data['initial']))
+        evaluator = self._syncEngine()
+        if evaluator is None:
+            return
+
+        self._cook_deferral.prolong()
+        steps = self._engine.iterPreview()
+        self._expr.reportErrors(evaluator)
+        self._preview_task.start(steps, len(self._engine.registry()), context=self._previewSlice)
 
+    @profiling.timed('MainWindow.cancel')
     def cancel(self):
         """
-        Sets the initial values to the parameters without adding actions
-        to the undo stack.
+        Sets the initial values to the changed parameters without adding
+        actions to the undo stack.
         """
-        with hou.undos.disabler():
-            for parm, data in self._parm_list.parms().items():
-                parm.set(data['initial'])
+        self._preview_task.cancel()
+        self._engine.rollback()
 
+    @profiling.timed('MainWindow.apply')
     def apply(self):
         """
         Sets new values to the parameters grouped into the single action
         on the undo stack.
         """
-        with hou.undos.disabler():
-            for parm, data in self._parm_list.parms().items():
-                parm.set(data['initial'])
-
-        with hou.undos.group('Apply expression to parms'):
-            for parm, data in self._parm_list.parms().items():
-                new_value = self._expr.eval(data['initial'])
-                parm.set(new_value)
+        self._preview_task.cancel()
+        evaluator = self._syncEngine()
+        self._engine.apply()
+        if evaluator is not None:
+            self._expr.reportErrors(evaluator)
+        self._updateProfilingReadout()
 
     def dragEnterEvent(self, event):
         mime_data = event.mimeData()
@@ -100,27 +358,19 @@ class MainWindow(QDialog):
                 mime_data.hasFormat(HOUDINI_NODE_PATH_MIME_FORMAT)):
             event.accept()
 
+    @profiling.timed('MainWindow.dropEvent')
     def dropEvent(self, event):
         mime_data = event.mimeData()
-        parms = []
 
         if mime_data.hasFormat(HOUDINI_PARM_PATH_MIME_FORMAT):
-            for parm_path in str(mime_data.data(HOUDINI_PARM_PATH_MIME_FORMAT)).split('\t'):
-                parms.append(hou.parm(parm_path))
+            parm_paths = str(mime_data.data(HOUDINI_PARM_PATH_MIME_FORMAT)).split('\t')
+            self._parm_list.addParms(hou.parm(parm_path) for parm_path in parm_paths)
 
         if mime_data.hasFormat(HOUDINI_NODE_PATH_MIME_FORMAT):
             source_parm = self._parm_list.sourceParm()
             source_parm_name = source_parm.name() if source_parm else None
-            for node_path in str(mime_data.data(HOUDINI_NODE_PATH_MIME_FORMAT)).split('\t'):
-                node = hou.node(node_path)
-                if source_parm_name:
-                    for parm in node.parms():
-                        if parm.name() == source_parm_name:
-                            parms.append(parm)
-                else:
-                    parms.extend(node.parms())
-
-        self._parm_list.addParms(parms)
+            node_paths = str(mime_data.data(HOUDINI_NODE_PATH_MIME_FORMAT)).split('\t')
+            self._parm_list.addNodes(node_paths, source_parm_name)
 
     def updateWindowTitle(self, parm=None):
         if not parm:
@@ -134,11 +384,18 @@ class MainWindow(QDialog):
         super(MainWindow, self).showEvent(event)
 
     def hideEvent(self, event):
-        if self.result() == QDialog.Accepted:
-            self.apply()
-            parm_names = set(parm.name() for parm in self._parm_list.parms())
-            for name in parm_names:
-                self._expr.saveToHistory(name)
-        else:
-            self.cancel()
+        self._harvest_task.cancel()
+        self._preview_scheduler.cancel()
+        try:
+            if self.result() == QDialog.Accepted:
+                self.apply()
+                with self._expr.historyBatch():
+                    for name, node_type in self._parm_list.parmNamesWithNodeTypes():
+                        self._expr.saveToHistory(name, node_type)
+                if self._engine.driver() is not None:
+                    self._createLiveLink()
+            else:
+                self.cancel()
+        finally:
+            self._cook_deferral.end()
         super(MainWindow, self).hideEvent(event)
@@ -1,38 +1,124 @@
 import hou
-from PySide2.QtCore import QAbstractListModel, Qt
+from PySide2.QtCore import QAbstractListModel, QModelIndex, Qt
 from PySide2.QtGui import QIcon, QPixmap
 
+from . import profiling
+
 EMPTY_ICON = QIcon(QPixmap(16, 16))
+MAX_REMOVED_RANGES = 64  # Larger scattered removals reset the model
+
+_node_type_icons = {}
+
+
+def nodeTypeIcon(node_type):
+    """Returns icon of the node type, loading it once per session."""
+    key = node_type.nameWithCategory()
+    icon = _node_type_icons.get(key)
+    if icon is None:
+        try:
+            icon = hou.qt.Icon(node_type.icon(), 16, 16)
+        except hou.OperationFailed:
+            icon = EMPTY_ICON
+        _node_type_icons[key] = icon
+    return icon
+
+
+def contiguousRanges(rows):
+    """Returns (first, last) ranges of the rows in descending order."""
+    ranges = []
+    for row in sorted(set(rows), reverse=True):
+        if ranges and ranges[-1][0] == row + 1:
+            ranges[-1] = (row, ranges[-1][1])
+        else:
+            ranges.append((row, row))
+    return ranges
 
 
 class ParmListModel(QAbstractListModel):
-    def __init__(self, parent=None):
+    def __init__(self, registry, parent=None):
         super(ParmListModel, self).__init__(parent)
 
-        self._parms = ()
+        self._registry = registry
+        self._icons = []
+        self._tooltips = []
+
+    @profiling.timed('ParmListModel.appendParms')
+    def appendParms(self, entries):
+        """
+        Appends (parm, initial value, integer flag) entries to the registry,
+        notifying views about the inserted rows only. Display data of the
+        rows is collected once here.
+        """
+        entries = self._registry.newEntries(entries)
+        if not entries:
+            return 0
+
+        icons = []
+        tooltips = []
+        for entry in entries:
+            parm = entry[0]
+            try:
+                icons.append(nodeTypeIcon(parm.node().type()))
+            except hou.OperationFailed:
+                icons.append(EMPTY_ICON)
+            tooltips.append(parm.description())
 
-    def setParmList(self, parms):
+        first = len(self._registry)
+        self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+        self._registry.extend(entries)
+        self._icons.extend(icons)
+        self._tooltips.extend(tooltips)
+        self.endInsertRows()
+        return len(entries)
+
+    def clear(self):
+        """Removes all the rows from the registry."""
         self.beginResetModel()
-        self._parms = tuple(parms)
+        self._registry.clear()
+        del self._icons[:]
+        del self._tooltips[:]
         self.endResetModel()
 
+    def removeParmRows(self, rows):
+        """
+        Removes the rows from the registry range by range, starting from
+        the end, so views keep the selection and the scroll position.
+        Scattered rows forming many ranges are removed in a single
+        compaction pass with a model reset.
+        """
+        ranges = contiguousRanges(rows)
+        if len(ranges) > MAX_REMOVED_RANGES:
+            removed = set(rows)
+            self.beginResetModel()
+            self._registry.removeRows(removed)
+            self._icons = [icon for row, icon in enumerate(self._icons) if row not in removed]
+            self._tooltips = [tooltip for row, tooltip in enumerate(self._tooltips) if row not in removed]
+            self.endResetModel()
+            return
+
+        for first, last in ranges:
+            self.beginRemoveRows(QModelIndex(), first, last)
+            self._registry.removeRange(first, last)
+            del self._icons[first:last + 1]
+            del self._tooltips[first:last + 1]
+            self.endRemoveRows()
+
     def rowCount(self, parent=None):
-        return len(self._parms)
+        if parent is not None and parent.isValid():
+            return 0
+        return len(self._registry)
 
     def data(self, index, role=None):
         if not index.isValid():
             return
 
-        parm = self._parms[index.row()]
+        row = index.row()
 
         if role == Qt.DisplayRole:
-            return parm.path()
+            return self._registry.path(row)
         elif role == Qt.DecorationRole:
-            try:
-                return hou.qt.Icon(parm.node().type().icon(), 16, 16)
-            except hou.OperationFailed:
-                return EMPTY_ICON
+            return self._icons[row]
         elif role == Qt.ToolTipRole:
-            return parm.description()
+            return self._tooltips[row]
         elif role == Qt.UserRole:
-            return parm
+            return self._registry.parm(row)
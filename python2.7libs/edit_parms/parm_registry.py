@@ -0,0 +1,277 @@
+from array import array
+from collections import namedtuple
+
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ParmGroup = namedtuple('ParmGroup', 'parm_tuple rows full')
+
+
+class ReadOnlyView(Sequence):
+    """Read-only sequence over the registry data without copying it."""
+
+    def __init__(self, data):
+        self._data = data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getitem__(self, index):
+        return self._data[index]
+
+    def __iter__(self):
+        return iter(self._data)
+
+
+def _deleted(data, first, last):
+    """Deletes the slice, replacing the array if it can not be resized because of an exported buffer."""
+    try:
+        del data[first:last + 1]
+    except BufferError:
+        data = data[:first] + data[last + 1:]
+    return data
+
+
+def _extended(data, values):
+    """Extends the array, replacing it if it can not be resized because of an exported buffer."""
+    try:
+        data.extend(values)
+    except BufferError:
+        data = array(data.typecode, data)
+        data.extend(values)
+    return data
+
+
+class ParmRegistry(object):
+    """
+    Compact storage of the bound parameters. Parameter handles, paths and
+    values are kept in parallel arrays indexed by row, along with the ids
+    of the parameter tuple and the node each parameter belongs to.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._parms = []
+        self._paths = []
+        self._initial = array('d')
+        self._current = array('d')
+        self._integer = array('b')
+        self._components = array('l')
+        self._tuple_ids = array('l')
+        self._node_ids = array('l')
+        self._index = {}
+
+        self._tuples = []
+        self._tuple_sizes = array('l')
+        self._tuple_keys = {}
+        self._node_keys = {}
+
+        self._groups = None
+
+    def __len__(self):
+        return len(self._parms)
+
+    def __contains__(self, parm):
+        return parm in self._parmIndex()
+
+    def _parmIndex(self):
+        if self._index is None:
+            self._index = {parm: row for row, parm in enumerate(self._parms)}
+        return self._index
+
+    def row(self, parm):
+        """Returns row of the parameter or None if it is not bound."""
+        return self._parmIndex().get(parm)
+
+    def newEntries(self, entries):
+        """Returns entries with parameters not bound yet, dropping duplicates."""
+        index = self._parmIndex()
+        seen = set()
+        new_entries = []
+        for entry in entries:
+            parm = entry[0]
+            if parm in index or parm in seen:
+                continue
+            seen.add(parm)
+            new_entries.append(entry)
+        return new_entries
+
+    def _tupleId(self, parm):
+        node_path = parm.node().path()
+        node_id = self._node_keys.setdefault(node_path, len(self._node_keys))
+
+        parm_tuple = parm.tuple()
+        key = (node_path, parm_tuple.name())
+        tuple_id = self._tuple_keys.get(key)
+        if tuple_id is None:
+            tuple_id = self._tuple_keys[key] = len(self._tuples)
+            self._tuples.append(parm_tuple)
+            self._tuple_sizes.append(len(parm_tuple))
+        return node_id, tuple_id
+
+    def add(self, parm, value, integer=False):
+        """Adds the parameter with its initial value. Returns False if it is already bound."""
+        return self.extend(((parm, value, integer),)) == 1
+
+    def extend(self, entries):
+        """
+        Adds (parm, initial value, integer flag) entries, skipping already
+        bound parameters. Returns number of the added parameters.
+        """
+        count = len(self._parms)
+        index = self._parmIndex()
+        initial = []
+        integer = []
+        components = []
+        node_ids = []
+        tuple_ids = []
+        for parm, value, is_integer in entries:
+            if parm in index:
+                continue
+
+            index[parm] = len(self._parms)
+            self._parms.append(parm)
+            self._paths.append(parm.path())
+            initial.append(value)
+            integer.append(bool(is_integer))
+            components.append(parm.componentIndex())
+            node_id, tuple_id = self._tupleId(parm)
+            node_ids.append(node_id)
+            tuple_ids.append(tuple_id)
+
+        if initial:
+            self._initial = _extended(self._initial, initial)
+            self._current = _extended(self._current, initial)
+            self._integer = _extended(self._integer, integer)
+            self._components = _extended(self._components, components)
+            self._node_ids = _extended(self._node_ids, node_ids)
+            self._tuple_ids = _extended(self._tuple_ids, tuple_ids)
+            self._groups = None
+        return len(self._parms) - count
+
+    def removeRows(self, rows):
+        """Removes parameters at the rows in a single compaction pass."""
+        removed = set(rows)
+        if not removed:
+            return
+
+        keep = [row for row in range(len(self._parms)) if row not in removed]
+        self._parms = [self._parms[row] for row in keep]
+        self._paths = [self._paths[row] for row in keep]
+        for name in ('_initial', '_current', '_integer', '_components', '_node_ids', '_tuple_ids'):
+            data = getattr(self, name)
+            setattr(self, name, array(data.typecode, (data[row] for row in keep)))
+        self._index = None
+        self._groups = None
+
+    def removeRange(self, first, last):
+        """Removes contiguous rows from first to last inclusive."""
+        del self._parms[first:last + 1]
+        del self._paths[first:last + 1]
+        for name in ('_initial', '_current', '_integer', '_components', '_node_ids', '_tuple_ids'):
+            setattr(self, name, _deleted(getattr(self, name), first, last))
+        self._index = None
+        self._groups = None
+
+    def parm(self, row):
+        return self._parms[row]
+
+    def parms(self):
+        """Returns read-only view of the parameter handles."""
+        return ReadOnlyView(self._parms)
+
+    def path(self, row):
+        return self._paths[row]
+
+    def paths(self):
+        """Returns read-only view of the parameter paths."""
+        return ReadOnlyView(self._paths)
+
+    def _arrayView(self, data, dtype):
+        if numpy is None:
+            return ReadOnlyView(data)
+        if not data:
+            return numpy.empty(0, dtype)
+        view = numpy.frombuffer(data, dtype)
+        view.flags.writeable = False
+        return view
+
+    def initialValues(self):
+        """
+        Returns read-only view of the initial values, a NumPy array sharing
+        the registry memory if NumPy is available. The view is valid until
+        the registry changes.
+        """
+        return self._arrayView(self._initial, numpy.float64 if numpy else None)
+
+    def integers(self):
+        """Returns read-only view of the flags marking integer parameters."""
+        return self._arrayView(self._integer, numpy.int8 if numpy else None)
+
+    def nodeIndices(self):
+        """
+        Returns index of the node of every parameter, nodes are numbered
+        from zero in the order they were bound.
+        """
+        if numpy is not None:
+            if not self._node_ids:
+                return numpy.empty(0, numpy.int64)
+            return numpy.unique(numpy.frombuffer(self._node_ids, numpy.dtype(self._node_ids.typecode)),
+                                return_inverse=True)[1].reshape(-1)
+
+        numbers = {node_id: number for number, node_id in enumerate(sorted(set(self._node_ids)))}
+        return [numbers[node_id] for node_id in self._node_ids]
+
+    def integerValue(self, row, value):
+        """Returns the value converted to int or float depending on the parameter type."""
+        return int(value) if self._integer[row] else float(value)
+
+    def currentValue(self, row):
+        """Returns the value last written to the parameter."""
+        return self.integerValue(row, self._current[row])
+
+    def setCurrentValue(self, row, value):
+        self._current[row] = value
+
+    def isInteger(self, row):
+        return bool(self._integer[row])
+
+    def groups(self):
+        """
+        Returns rows grouped by parameter tuple. Groups of the same node
+        follow each other in the order the nodes were bound, components
+        are sorted by index. A full group covers all components of its
+        tuple. Groups are cached until the registry changes.
+        """
+        if self._groups is not None:
+            return self._groups
+
+        node_ids = self._node_ids
+        tuple_ids = self._tuple_ids
+        components = self._components
+        rows = sorted(range(len(self._parms)),
+                      key=lambda row: (node_ids[row], tuple_ids[row], components[row]))
+
+        groups = []
+        start = 0
+        while start < len(rows):
+            tuple_id = tuple_ids[rows[start]]
+            end = start + 1
+            while end < len(rows) and tuple_ids[rows[end]] == tuple_id:
+                end += 1
+            group_rows = tuple(rows[start:end])
+            groups.append(ParmGroup(self._tuples[tuple_id], group_rows,
+                                    len(group_rows) == self._tuple_sizes[tuple_id]))
+            start = end
+
+        self._groups = groups
+        return groups
@@ -0,0 +1,24 @@
+def writeGroup(registry, group, values):
+    """
+    Writes values indexed by registry row to the group parameters, skipping
+    None values and values already written. A full tuple with several
+    changed components is set with a single call.
+    """
+    changed = [row for row in group.rows
+               if values[row] is not None and values[row] != registry.currentValue(row)]
+    if not changed:
+        return 0
+
+    if group.full and len(changed) > 1:
+        changed_rows = set(changed)
+        group.parm_tuple.set([registry.currentValue(row) if row not in changed_rows
+                              else registry.integerValue(row, values[row])
+                              for row in group.rows])
+    else:
+        for row in changed:
+            registry.parm(row).set(registry.integerValue(row, values[row]))
+
+    for row in changed:
+        registry.setCurrentValue(row, values[row])
+    return len(changed)
+
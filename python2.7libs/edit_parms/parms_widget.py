@@ -3,6 +3,10 @@ from PySide2.QtCore import Signal, Qt
 from PySide2.QtWidgets import QGridLayout, QSizePolicy, QSpacerItem
 from PySide2.QtWidgets import QWidget, QPushButton, QListView
 
+from . import profiling
+from .chunked_task import ChunkedTask
+from .engine import Engine
+from .harvest import ParmNameIndex, iterIndexEntries, iterNodeEntries, matchNodes, parmEntry
 from .parm_list_model import ParmListModel
 
 
@@ -10,11 +14,14 @@ class ParmsWidget(QWidget):
     sourceParmChanged = Signal(hou.Parm)
     needPreview = Signal()
 
-    def __init__(self):
+    def __init__(self, engine=None):
         super(ParmsWidget, self).__init__()
 
         self._source_parm = None
-        self._parms = {}
+        self._engine = engine if engine is not None else Engine()
+        self._registry = self._engine.registry()
+        self._harvest_task = ChunkedTask(parent=self)
+        self._bind_pattern = ('/obj/*', '', '')
 
         layout = QGridLayout(self)
         layout.setContentsMargins(4, 4, 4, 4)
@@ -36,15 +43,24 @@ class ParmsWidget(QWidget):
         self._set_as_source_button.clicked.connect(self.setCurrentAsSource)
         layout.addWidget(self._set_as_source_button, 0, 1)
 
+        self._bind_by_pattern_button = QPushButton()
+        self._bind_by_pattern_button.setFocusPolicy(Qt.NoFocus)
+        self._bind_by_pattern_button.setFixedWidth(self._bind_by_pattern_button.sizeHint().height())
+        self._bind_by_pattern_button.setIcon(hou.qt.Icon('BUTTONS_list_add', 16, 16))
+        self._bind_by_pattern_button.setToolTip('Bind parameters by node path and name patterns.')
+        self._bind_by_pattern_button.clicked.connect(self._askBindPattern)
+        layout.addWidget(self._bind_by_pattern_button, 0, 2)
+
         spacer = QSpacerItem(0, 0, QSizePolicy.Expanding, QSizePolicy.Ignored)
-        layout.addItem(spacer, 0, 2, 1, -1)
+        layout.addItem(spacer, 0, 3, 1, -1)
 
         self._view = QListView()
         self._view.setFocusPolicy(Qt.ClickFocus)
         self._view.setSelectionMode(QListView.ExtendedSelection)
+        self._view.setUniformItemSizes(True)
         layout.addWidget(self._view, 1, 0, 1, -1)
 
-        self._model = ParmListModel(self)
+        self._model = ParmListModel(self._registry, self)
         self._view.setModel(self._model)
 
         spacer = QSpacerItem(0, 0, QSizePolicy.Ignored, QSizePolicy.Expanding)
@@ -68,44 +84,95 @@ class ParmsWidget(QWidget):
 
         self.setSourceParm(index.data(Qt.UserRole))
 
-    def _updateParmList(self):
-        self._model.setParmList(self._parms.keys())
+    def clear(self):
+        """Unbinds all the parameters without restoring their values."""
+        self._harvest_task.cancel()
+        self._model.clear()
+        self._source_parm = None
 
     def removeSelected(self):
         """Unbind selected parameters."""
-        with hou.undos.disabler():
-            for index in self._view.selectedIndexes():
-                parm = index.data(Qt.UserRole)
-                parm_data = self._parms[parm]
-                parm.set(parm_data['initial'])
-                self._parms.pop(parm, None)
-        self._updateParmList()
+        rows = [index.row() for index in self._view.selectedIndexes()]
+        self._engine.release(rows)
+        self._model.removeParmRows(rows)
         self.needPreview.emit()
 
+    @profiling.timed('ParmsWidget.addParms')
     def addParms(self, parms):
         """
         Adds parameters to the list. Already added parameters will be skipped.
         """
-        for parm in parms:
-            if not parm:
-                continue
+        self.addEntries(parmEntry(parm) for parm in parms if parm not in self._registry)
 
-            if parm.isLocked():
-                continue
+    def addEntries(self, entries):
+        """
+        Adds (parm, initial value, integer flag) entries collected by the
+        harvest functions. Empty entries and added parameters are skipped.
+        """
+        if self._model.appendParms([entry for entry in entries if entry]):
+            self.needPreview.emit()
 
-            if parm in self._parms:
-                continue
+    def parms(self):
+        """Returns read-only view of all the parameters."""
+        return self._registry.parms()
+
+    def parmNamesWithNodeTypes(self):
+        """Returns unique (parm name, node type name) pairs. Node types are queried once per tuple."""
+        names = set()
+        for group in self._registry.groups():
+            node_type = group.parm_tuple.node().type().nameWithCategory()
+            names.update((self._registry.parm(row).name(), node_type) for row in group.rows)
+        return names
+
+    def registry(self):
+        """
+        Returns registry of the parameters holding their initial values
+        and the values last written to them.
+        """
+        return self._registry
 
-            parm_template = parm.parmTemplate()
-            if parm_template.type() not in (hou.parmTemplateType.Int, hou.parmTemplateType.Float):
-                continue
+    def harvestTask(self):
+        """Returns task adding parameters of many nodes in batches."""
+        return self._harvest_task
 
-            self._parms[parm] = {
-                'initial': parm.eval(),
-            }
-        self._updateParmList()
-        self.needPreview.emit()
+    def _iterAddEntries(self, batches):
+        for done, entries in batches:
+            self.addEntries(entries)
+            yield done
 
-    def parms(self):
-        """Returns all parameters and their data."""
-        return self._parms.copy()
+    def _startHarvest(self, batches, total):
+        if self._harvest_task.isRunning():
+            self._harvest_task.finish()
+        self._harvest_task.start(self._iterAddEntries(batches), total)
+
+    def addNodes(self, node_paths, parm_name=None):
+        """
+        Adds editable parameters of the nodes in batches between the events.
+        If parm_name is given, only parameters with this name are added.
+        """
+        self._startHarvest(iterNodeEntries(node_paths, parm_name), len(node_paths))
+
+    def bindByPattern(self, node_pattern, parm_pattern, node_type_pattern=None):
+        """
+        Binds parameters matching the name pattern, like t?|r?, on the nodes
+        matching the path glob, like /obj/geo*/xform*, optionally filtered
+        by the node type name glob. The network is walked once, matching
+        parameter names are looked up once per node type.
+        """
+        nodes = matchNodes(node_pattern, node_type_pattern)
+        self._startHarvest(iterIndexEntries(nodes, ParmNameIndex(parm_pattern)), len(nodes))
+
+    def _askBindPattern(self):
+        button, patterns = hou.ui.readMultiInput(
+            'Bind parameters matching the patterns.',
+            ('Node Path', 'Parameter Names', 'Node Type'),
+            buttons=('Bind', 'Cancel'), default_choice=0, close_choice=1,
+            initial_contents=self._bind_pattern, title='Bind by Pattern'
+        )
+        if button != 0:
+            return
+
+        self._bind_pattern = patterns
+        node_pattern, parm_pattern, node_type_pattern = patterns
+        if node_pattern and parm_pattern:
+            self.bindByPattern(node_pattern, parm_pattern, node_type_pattern or None)
@@ -0,0 +1,98 @@
+from timeit import default_timer
+
+from PySide2.QtCore import QObject, QTimer
+
+FRAME_INTERVAL = 16  # ms
+
+
+class PreviewScheduler(QObject):
+    """
+    Coalesces bursts of preview requests into at most one preview per
+    interval. The interval adapts to the measured preview duration, so that
+    previews take no more than the given share of the time.
+    """
+
+    def __init__(self, callback, min_interval=FRAME_INTERVAL, max_interval=250, load=0.5, parent=None):
+        super(PreviewScheduler, self).__init__(parent)
+        self._callback = callback
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._load = load
+        self._duration = 0.0
+        self._previous_duration = 0.0
+        self._last_run = None
+        self._run_start = None
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._run)
+
+    def setBudget(self, min_interval, max_interval, load=None):
+        """Sets interval limits in milliseconds and the share of time previews may take."""
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        if load is not None:
+            self._load = load
+
+    def duration(self):
+        """Returns smoothed preview duration in milliseconds."""
+        return self._duration
+
+    def interval(self):
+        """Returns current minimal interval between previews in milliseconds."""
+        interval = self._duration * (1 - self._load) / self._load
+        return int(min(max(interval, self._min_interval), self._max_interval))
+
+    def isPending(self):
+        return self._timer.isActive()
+
+    def request(self):
+        """
+        Schedules a preview. Requests made while one is pending are merged
+        into it, the preview itself always uses the latest state.
+        """
+        if self._timer.isActive():
+            return
+
+        delay = 0
+        if self._last_run is not None:
+            elapsed = (default_timer() - self._last_run) * 1000
+            delay = max(self.interval() - elapsed, 0)
+        self._timer.start(int(delay))
+
+    def flush(self):
+        """Runs the pending preview immediately."""
+        if self._timer.isActive():
+            self._timer.stop()
+            self._run()
+
+    def cancel(self):
+        """Drops the pending preview."""
+        self._timer.stop()
+
+    def finishRun(self):
+        """
+        Marks the end of the last preview if it continued after the callback
+        returned, e.g. in time slices, so its whole duration is measured.
+        """
+        if self._run_start is None:
+            return
+
+        self._last_run = default_timer()
+        self._duration = self._smoothed((self._last_run - self._run_start) * 1000)
+        self._run_start = None
+
+    def _smoothed(self, duration):
+        if self._previous_duration:
+            return self._previous_duration * 0.7 + duration * 0.3
+        return duration
+
+    def _run(self):
+        start = self._run_start = default_timer()
+        self._previous_duration = self._duration
+        try:
+            self._callback()
+        finally:
+            if self._run_start is not None:
+                self._last_run = default_timer()
+                self._duration = self._smoothed((self._last_run - start) * 1000)
@@ -0,0 +1,169 @@
+"""
+Optional timing of the hot paths. Spans are aggregated per name into
+counters and histograms for the session and recorded as trace events,
+which can be exported in the Chrome trace format (chrome://tracing,
+ui.perfetto.dev). Disabled spans cost a flag check. Profiling is enabled
+by the EDITPARMS_PROFILE environment variable or by setEnabled.
+"""
+import json
+import math
+import os
+import threading
+from functools import wraps
+from timeit import default_timer
+
+MAX_TRACE_EVENTS = 100000
+
+_enabled = os.environ.get('EDITPARMS_PROFILE', '0') not in ('', '0')
+_origin = default_timer()
+_stats = {}
+_events = []
+
+
+class SpanStats(object):
+    """Number, total, minimum, maximum and last duration of the spans, with a histogram by powers of two."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.last = 0.0
+        self.histogram = {}
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        self.last = duration
+        self.max = max(self.max, duration)
+        self.min = duration if self.min is None else min(self.min, duration)
+        bucket = 2 ** max(int(math.ceil(math.log(max(duration * 1e6, 1), 2))), 0)  # us
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def asDict(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total * 1000,
+            'mean_ms': self.mean * 1000,
+            'min_ms': (self.min or 0.0) * 1000,
+            'max_ms': self.max * 1000,
+            'last_ms': self.last * 1000,
+            'histogram_us': dict((str(bucket), count) for bucket, count in sorted(self.histogram.items())),
+        }
+
+
+class _Span(object):
+    __slots__ = ('_name', '_start')
+
+    def __init__(self, name):
+        self._name = name
+
+    def __enter__(self):
+        self._start = default_timer()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self._name, self._start, default_timer() - self._start)
+        return False
+
+
+class _NullSpan(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def isEnabled():
+    return _enabled
+
+
+def setEnabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def record(name, start, duration):
+    """Adds the span started at the default_timer time to the statistics and the trace."""
+    stats = _stats.get(name)
+    if stats is None:
+        stats = _stats[name] = SpanStats()
+    stats.add(duration)
+    if len(_events) < MAX_TRACE_EVENTS:
+        _events.append((name, start, duration, threading.current_thread().ident))
+
+
+def span(name):
+    """Returns context manager timing the block under the name, does nothing if profiling is disabled."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def timed(name=None):
+    """Decorator timing every call of the function, named after the function by default."""
+    def decorate(function):
+        span_name = name or function.__name__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Span(span_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def reset():
+    """Drops the collected statistics and trace events."""
+    global _origin
+    _origin = default_timer()
+    _stats.clear()
+    del _events[:]
+
+
+def stats():
+    """Returns statistics of the spans by name as plain dictionaries."""
+    return dict((name, span_stats.asDict()) for name, span_stats in _stats.items())
+
+
+def summary(limit=4, names=None):
+    """
+    Returns a compact single-line readout of the spans taking the most
+    total time: the last duration and the number of calls.
+    """
+    items = [(name, span_stats) for name, span_stats in _stats.items() if names is None or name in names]
+    items.sort(key=lambda item: item[1].total, reverse=True)
+    return '  '.join('{} {:.1f} ms x{}'.format(name.rpartition('.')[2], span_stats.last * 1000, span_stats.count)
+                     for name, span_stats in items[:limit])
+
+
+def exportTrace(file_path):
+    """Writes the trace events and the statistics in the Chrome trace format. Returns number of the events."""
+    pid = os.getpid()
+    trace_events = [{
+        'name': name,
+        'ph': 'X',
+        'ts': (start - _origin) * 1e6,
+        'dur': duration * 1e6,
+        'pid': pid,
+        'tid': tid,
+    } for name, start, duration, tid in _events]
+    with open(file_path, 'w') as trace_file:
+        json.dump({
+            'traceEvents': trace_events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'stats': stats()},
+        }, trace_file)
+    return len(trace_events)
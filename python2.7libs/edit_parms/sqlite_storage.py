@@ -0,0 +1,158 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from . import profiling
+from .singleton import Singleton
+from .storage import storageFilePath
+
+SQLITE_STORAGE_FILE_NAME = 'editparms.db'
+HISTORY_SIZE = int(os.environ.get('EDITPARMS_HISTORY_SIZE', 1000))
+HISTORY_AGE = float(os.environ.get('EDITPARMS_HISTORY_AGE_DAYS', 365)) * 24 * 60 * 60  # s
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS presets (
+    expression TEXT PRIMARY KEY,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (
+    parm_name TEXT NOT NULL,
+    node_type TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (parm_name, node_type)
+);
+CREATE INDEX IF NOT EXISTS history_accessed ON history (accessed);
+'''
+
+
+class SqliteStorage(object):
+    """
+    Storage keeping presets and history in an SQLite database. History
+    entries are looked up by parameter name, optionally refined by node
+    type, and evicted by age and by the least recent use. Data of the JSON
+    storage is migrated when the database is created.
+    """
+    __metaclass__ = Singleton
+
+    def __init__(self, file_path=None, history_size=HISTORY_SIZE, history_age=HISTORY_AGE):
+        self._file_path = file_path or storageFilePath(SQLITE_STORAGE_FILE_NAME)
+        self._history_size = history_size
+        self._history_age = history_age
+        self._connection = None
+        self._batch_depth = 0
+
+    def _connect(self):
+        if self._connection is not None:
+            return self._connection
+
+        is_new = not os.path.isfile(self._file_path)
+        self._connection = sqlite3.connect(self._file_path, timeout=5)
+        self._connection.executescript(SCHEMA)
+        if is_new:
+            self._migrate(storageFilePath())
+        self._connection.commit()
+        return self._connection
+
+    def _migrate(self, json_file_path):
+        """Imports presets and history from the JSON storage file."""
+        try:
+            with open(json_file_path) as storage_file:
+                data = json.load(storage_file)
+            accessed = os.stat(json_file_path).st_mtime
+        except (IOError, OSError, ValueError):
+            return
+
+        self._connection.executemany(
+            'INSERT OR IGNORE INTO presets (expression, position) VALUES (?, ?)',
+            ((expression, position) for position, expression in enumerate(data.get('presets', [])))
+        )
+        self._connection.executemany(
+            'INSERT OR REPLACE INTO history (parm_name, node_type, data, accessed) VALUES (?, \'\', ?, ?)',
+            ((parm_name, json.dumps(entry), accessed) for parm_name, entry in data.get('history', {}).items())
+        )
+
+    def _commit(self):
+        if not self._batch_depth:
+            self._connect().commit()
+
+    @profiling.timed('Storage.save')
+    def flush(self):
+        """Commits pending changes."""
+        if self._connection is not None:
+            self._connection.commit()
+
+    @contextmanager
+    def batch(self):
+        """Groups changes into a single transaction."""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.flush()
+
+    @property
+    def presets(self):
+        rows = self._connect().execute('SELECT expression FROM presets ORDER BY position')
+        return [expression for expression, in rows]
+
+    def addPreset(self, expression):
+        self._connect().execute(
+            'INSERT OR IGNORE INTO presets (expression, position) '
+            'SELECT ?, COALESCE(MAX(position) + 1, 0) FROM presets', (expression,)
+        )
+        self._commit()
+
+    def removePreset(self, expression):
+        self._connect().execute('DELETE FROM presets WHERE expression = ?', (expression,))
+        self._commit()
+
+    @profiling.timed('Storage.load')
+    def setupFromHistory(self, parm_name, node_type=None):
+        """
+        Returns history entry for the parameter name and node type, falling
+        back to the latest entry for the parameter name.
+        """
+        connection = self._connect()
+        for key in ((node_type,) if node_type else ()) + ('',):
+            row = connection.execute('SELECT data FROM history WHERE parm_name = ? AND node_type = ?',
+                                     (parm_name, key)).fetchone()
+            if row is None:
+                continue
+
+            connection.execute('UPDATE history SET accessed = ? WHERE parm_name = ? AND node_type = ?',
+                               (time.time(), parm_name, key))
+            self._commit()
+            return json.loads(row[0])
+
+    def addToHistory(self, parm_name, data, node_type=None):
+        connection = self._connect()
+        now = time.time()
+        entry = json.dumps(data)
+        for key in ((node_type,) if node_type else ()) + ('',):
+            connection.execute(
+                'INSERT OR REPLACE INTO history (parm_name, node_type, data, accessed) VALUES (?, ?, ?, ?)',
+                (parm_name, key, entry, now)
+            )
+        self._evict(now)
+        self._commit()
+
+    def _evict(self, now):
+        """
+        Removes history entries older than the age limit and entries of the
+        least recently used parameter names over the size limit.
+        """
+        connection = self._connect()
+        if self._history_age > 0:
+            connection.execute('DELETE FROM history WHERE accessed < ?', (now - self._history_age,))
+        if self._history_size > 0:
+            connection.execute(
+                'DELETE FROM history WHERE parm_name IN '
+                '(SELECT parm_name FROM history GROUP BY parm_name '
+                'ORDER BY MAX(accessed) DESC LIMIT -1 OFFSET ?)',
+                (self._history_size,)
+            )
@@ -1,44 +1,183 @@
+import atexit
 import json
 import os
+from contextlib import contextmanager
+from timeit import default_timer
 
 import hou
 
+try:
+    from PySide2.QtCore import QCoreApplication, QFileSystemWatcher, QTimer
+except ImportError:
+    QCoreApplication = QFileSystemWatcher = QTimer = None
+
+from . import profiling
 from .singleton import Singleton
 
-STORAGE_FILE_PATH = hou.expandString('$HOUDINI_USER_PREF_DIR/editparms.data')
+STORAGE_FILE_NAME = 'editparms.data'
+FLUSH_DELAY = 1000  # ms
+CHECK_INTERVAL = 5  # s, the watcher misses changes made on other hosts of network file systems
+
+
+def storageFilePath(file_name=STORAGE_FILE_NAME):
+    """Returns path of the storage file in the Houdini user preferences directory."""
+    return os.path.join(hou.expandString('$HOUDINI_USER_PREF_DIR'), file_name)
+
+
+def _fileStamp(path):
+    """Returns modification time and size of the file."""
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size
+
+
+def _replace(source, destination):
+    """Renames the file over the existing one."""
+    try:
+        os.replace(source, destination)
+    except AttributeError:  # Python 2
+        if os.name == 'nt' and os.path.exists(destination):
+            os.remove(destination)
+        os.rename(source, destination)
 
 
 class Storage(object):
     __metaclass__ = Singleton
 
     def __init__(self):
-        self._timestamp = 0
+        self._file_path = storageFilePath()
+        self._timestamp = None
         self._data = {
             'presets': [],
             'history': {}
         }
+        self._stale = True
+        self._last_check = 0
+        self._watcher = None
+        self._pending_presets = []
+        self._pending_history = {}
+        self._dirty = False
+        self._flush_scheduled = False
+        self._batch_depth = 0
+        atexit.register(self.flush)
+
+    def _watch(self):
+        """Starts watching the storage file and its directory if there is an event loop."""
+        if QFileSystemWatcher is None or QCoreApplication.instance() is None:
+            return
+
+        self._watcher = QFileSystemWatcher()
+        self._watcher.fileChanged.connect(self._onChanged)
+        self._watcher.directoryChanged.connect(self._onChanged)
+        storage_dir = os.path.dirname(self._file_path)
+        if os.path.isdir(storage_dir):
+            self._watcher.addPath(storage_dir)
+        self._onChanged()
+
+    def _onChanged(self):
+        self._stale = True
+        if os.path.isfile(self._file_path) and self._file_path not in self._watcher.files():
+            self._watcher.addPath(self._file_path)  # Replaced files drop out of the watch list
+
+    def _needsReload(self):
+        """
+        Returns True if the file may have changed. The watcher reports local
+        changes immediately, the file is checked every CHECK_INTERVAL anyway.
+        """
+        if self._watcher is None and self._last_check == 0:
+            self._watch()
+
+        if default_timer() - self._last_check > CHECK_INTERVAL:
+            self._stale = True
+        return self._stale
+
+    @profiling.timed('Storage.load')
+    def _reload(self):
+        """
+        Loads the file if it was changed by another session and merges
+        the local changes not written yet into the loaded data.
+        """
+        self._stale = False
+        self._last_check = default_timer()
+        try:
+            timestamp = _fileStamp(self._file_path)
+        except OSError:
+            return
+        if timestamp == self._timestamp:
+            return
+
+        try:
+            with open(self._file_path) as storage_file:
+                data = json.load(storage_file)
+        except (IOError, ValueError):
+            return  # Unsuccessful attempt - cheer up
+        self._timestamp = timestamp
+
+        presets = data.setdefault('presets', [])
+        for added, expression in self._pending_presets:
+            if added and expression not in presets:
+                presets.append(expression)
+            elif not added and expression in presets:
+                presets.remove(expression)
+        data.setdefault('history', {}).update(self._pending_history)
+        self._data = data
 
     @property
     def data(self):
-        if not os.path.isfile(STORAGE_FILE_PATH):
-            return self._data
-
-        timestamp = os.stat(STORAGE_FILE_PATH).st_mtime
-        if self._timestamp != timestamp:
-            try:
-                with open(STORAGE_FILE_PATH) as storage_file:
-                    self._data = json.load(storage_file)
-                    self._timestamp = os.stat(STORAGE_FILE_PATH).st_mtime
-            except IOError:
-                pass  # Unsuccessful attempt - cheer up
+        """Returns data, reloading it only after the file was changed externally."""
+        if self._needsReload():
+            self._reload()
         return self._data
 
     def _save(self):
+        """
+        Marks data as changed. Changes are written once the batch is over
+        or on the idle timer, or immediately if there is no event loop.
+        """
+        self._dirty = True
+        if self._batch_depth:
+            return
+
+        if QTimer is None or QCoreApplication.instance() is None:
+            self.flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            QTimer.singleShot(FLUSH_DELAY, self.flush)
+
+    @profiling.timed('Storage.save')
+    def flush(self):
+        """
+        Writes changed data to a temporary file and renames it over
+        the storage file, so the file is never left half written.
+        """
+        self._flush_scheduled = False
+        if not self._dirty:
+            return
+
+        self._reload()  # Merge with changes made by other sessions
+        temp_file_path = '{}.{}.tmp'.format(self._file_path, os.getpid())
         try:
-            with open(STORAGE_FILE_PATH, 'w') as storage_file:
+            with open(temp_file_path, 'w') as storage_file:
                 json.dump(self._data, storage_file)
-        except IOError:
+                storage_file.flush()
+                os.fsync(storage_file.fileno())
+            _replace(temp_file_path, self._file_path)
+            self._timestamp = _fileStamp(self._file_path)
+        except (IOError, OSError):
             return
+        self._dirty = False
+        del self._pending_presets[:]
+        self._pending_history.clear()
+
+    @contextmanager
+    def batch(self):
+        """Groups changes to be written with a single flush at the end."""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.flush()
 
     @property
     def presets(self):
@@ -48,6 +187,7 @@ class Storage(object):
         presets_data = self.data.setdefault('presets', [])
         if expression not in presets_data:
             presets_data.append(expression)
+            self._pending_presets.append((True, expression))
             self._save()
 
     def removePreset(self, expression):
@@ -59,16 +199,29 @@ class Storage(object):
             presets.remove(expression)
         except ValueError:
             return
+        self._pending_presets.append((False, expression))
         self._save()
 
-    def setupFromHistory(self, parm_name):
+    def setupFromHistory(self, parm_name, node_type=None):
         history_data = self.data.get('history')
         if not history_data:
             return None
 
         return history_data.get(parm_name)
 
-    def addToHistory(self, parm_name, data):
+    def addToHistory(self, parm_name, data, node_type=None):
         history_data = self.data.setdefault('history', {})
         history_data[parm_name] = data
+        self._pending_history[parm_name] = data
         self._save()
+
+
+def openStorage():
+    """
+    Returns storage selected by the EDITPARMS_STORAGE environment variable:
+    json (default) or sqlite.
+    """
+    if os.environ.get('EDITPARMS_STORAGE', 'json').lower() == 'sqlite':
+        from .sqlite_storage import SqliteStorage
+        return SqliteStorage()
+    return Storage()
@@ -1,7 +1,20 @@
-def markErrorInExpr(expr, exception):
-    position = exception.offset - 1
-    return '{}[{}]{}'.format(
-        expr[:max(position, 0)],
-        expr[position] if 0 <= position < len(expr) else '',
-        expr[position + 1:]
-    )
+def markErrorInExpr(expr, exception=None, start=None, end=None):
+    """
+    Returns the expression with the erroneous part in brackets. The part
+    is taken from the syntax error offsets or given as start and end
+    indices. The expression is returned as is if the position is unknown.
+    """
+    if exception is not None:
+        offset = getattr(exception, 'offset', None)
+        if offset is None:
+            return expr
+        start = offset - 1
+        end_offset = getattr(exception, 'end_offset', None)
+        end = end_offset - 1 if end_offset and end_offset > offset else start + 1
+
+    if start is None:
+        return expr
+
+    start = min(max(start, 0), len(expr))
+    end = min(max(end if end is not None else start + 1, start), len(expr))
+    return '{}[{}]{}'.format(expr[:start], expr[start:end], expr[end:])